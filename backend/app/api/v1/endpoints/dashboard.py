@@ -1,57 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from datetime import datetime, timedelta
-import pandas as pd
-import joblib
-import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from contextlib import aclosing, nullcontext
+from datetime import date, timedelta
+import time
 import logging
 
-from app.db.session import get_db
+from app.api import deps
+from app.core.cache import dashboard_cache, fresh_reads, reading_fresh
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.analytics_cube import CATEGORY_DIMENSIONS, DIMENSIONS, VITALS, analytics_cube
 from app.services.analytics_engine import analytics_engine
+from app.services.census_rollup import census_rollup
+from app.services.dashboard_broadcaster import DashboardBroadcaster
+from app.services.downsampling import lttb_indices
+from app.services.forecast_service import MAX_HORIZON_DAYS, forecast_service
+from app.services.kpi_engine import kpi_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# --- MODEL PATH ---
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-MODEL_PATH = os.path.join(BASE_DIR, "ml", "models", "census_model.joblib")
+# Census chart payload stays this size however long the history gets
+CENSUS_MAX_POINTS = 500
+CENSUS_MAX_POINTS_LIMIT = 5000
 
-def get_ai_census_forecast(db: Session, days_forecast: int = 7):
+@dashboard_cache.memoize("census_forecast")
+def get_ai_census_forecast(db: Session, days_forecast: int = 7, window: int = None,
+                           max_points: int = CENSUS_MAX_POINTS):
     # 1. Get Real History (STRICTLY EXCLUDING TODAY)
-    # This prevents the "Drop to Zero" bug
-    query = text("""
-        SELECT date(admission_date) as date, count(*) as count 
-        FROM patients 
-        WHERE date(admission_date) < CURRENT_DATE
-        GROUP BY date(admission_date) 
-        ORDER BY date(admission_date) ASC
-    """)
-    result = db.execute(query).fetchall()
-    history_data = [{"date": str(row.date), "count": row.count} for row in result]
-
-    # 2. Generate Prediction
+    # This prevents the "Drop to Zero" bug. Read from the daily rollup, not the patients table.
+    # `window` keeps only the last N days; longer series are LTTB-downsampled to `max_points`.
+    today = date.today()
+    start = today - timedelta(days=window) if window else None
+    history = census_rollup.daily_totals(db, start=start, end=today)
+    if len(history) > max_points:
+        days = [day.toordinal() for day, _ in history]
+        keep = lttb_indices(days, [count for _, count in history], max_points)
+        history = [history[i] for i in keep]
+    history_data = [{"date": str(day), "count": count} for day, count in history]
+
+    # 2. Generate Prediction (model loaded once, forecast memoized per model version + start day)
     predicted_data = []
     try:
-        if os.path.exists(MODEL_PATH):
-            census_model = joblib.load(MODEL_PATH)
-            
-            # Start prediction from TOMORROW so lines connect perfectly
-            start_date = datetime.now() + timedelta(days=1)
-            future_dates = pd.date_range(start=start_date, periods=days_forecast)
-            future_df = pd.DataFrame({"ds": future_dates})
-            
-            forecast = census_model.predict(future_df)
-            
-            for _, row in forecast.iterrows():
-                predicted_data.append({
-                    "date": row['ds'].strftime('%Y-%m-%d'),
-                    "count": max(0, int(row['yhat']))
-                })
-        else:
-            logger.warning("⚠️ Model file not found.")
+        # Start prediction from TOMORROW so lines connect perfectly
+        predicted_data = forecast_service.forecast(date.today() + timedelta(days=1), days_forecast)
     except Exception as e:
         logger.error(f"⚠️ Forecasting error: {e}")
 
@@ -60,16 +56,154 @@ def get_ai_census_forecast(db: Session, days_forecast: int = 7):
         "predicted": predicted_data
     }
 
+# name -> (loader(db), value served when the section fails or times out)
+DASHBOARD_SECTIONS = {
+    "kpi": (analytics_engine.get_kpi_metrics,
+            {"activePatients": 0, "avgLos": 0, "readmissionRate": 0, "virtualBedUtilization": 0}),
+    "censusData": (get_ai_census_forecast, {"actual": [], "predicted": []}),
+    "populationRisk": (analytics_engine.get_population_risk, []),
+    "zoneBreakdown": (kpi_engine.zone_breakdown, []),
+    "featureImportance": (lambda db: analytics_engine.get_feature_importance(), []),
+    "readmissionTrend": (lambda db: analytics_engine.get_readmission_trend(), []),
+}
+
+# Bounds how many pooled DB connections dashboard sections can hold at once
+section_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_SECTION_WORKERS,
+                                      thread_name_prefix="dashboard-section")
+
+def run_section(loader, fresh: bool = False):
+    """
+    Runs one section on its own session (= its own pooled connection); returns (value, ms).
+    `fresh` carries the caller's `fresh_reads()` over to this worker thread.
+    """
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with fresh_reads() if fresh else nullcontext():
+            return loader(db), (time.perf_counter() - start) * 1000
+    finally:
+        db.close()
+
+def build_dashboard_metrics(timeout: float = None):
+    """
+    Runs every section concurrently and waits at most `timeout` seconds overall.
+    A section that fails or misses the deadline is replaced by its empty value and reported in
+    `errors`; since sections are cached, a late one still lands in the cache for the next poll.
+    Called inside `fresh_reads()`, every section reads fresh too. Returns (payload, {section: ms}).
+    """
+    timeout = settings.DASHBOARD_SECTION_TIMEOUT_SECONDS if timeout is None else timeout
+    fresh = reading_fresh()
+    futures = {name: section_executor.submit(run_section, loader, fresh)
+               for name, (loader, _) in DASHBOARD_SECTIONS.items()}
+    deadline = time.monotonic() + timeout
+
+    payload, timings, errors = {}, {}, {}
+    for name, future in futures.items():
+        fallback = DASHBOARD_SECTIONS[name][1]
+        try:
+            payload[name], timings[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeout:
+            logger.warning(f"⚠️ Dashboard section '{name}' timed out after {timeout}s")
+            payload[name], errors[name] = fallback, "timeout"
+        except Exception as e:
+            logger.error(f"❌ Dashboard section '{name}' failed: {e}")
+            payload[name], errors[name] = fallback, str(e)
+
+    payload["partial"] = bool(errors)
+    payload["errors"] = errors
+    return payload, timings
+
 @router.get("/")
-def get_dashboard_metrics(db: Session = Depends(get_db)):
+def get_dashboard_metrics(response: Response):
+    """
+    Sections run concurrently (each on its own connection) and are individually cached: fresh for
+    DASHBOARD_CACHE_TTL_SECONDS, invalidated by any patient write, refreshed in the background
+    while the previous value is served. Failed or slow sections come back empty with `partial: true`.
+    Per-section durations are reported in the `Server-Timing` header.
+    """
+    start = time.perf_counter()
     try:
-        return {
-            "kpi": analytics_engine.get_kpi_metrics(db),
-            "censusData": get_ai_census_forecast(db),
-            "populationRisk": analytics_engine.get_population_risk(db),
-            "featureImportance": analytics_engine.get_feature_importance(),
-            "readmissionTrend": analytics_engine.get_readmission_trend()
-        }
+        payload, timings = build_dashboard_metrics()
     except Exception as e:
         logger.error(f"❌ Dashboard Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    response.headers["Server-Timing"] = ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+    return payload
+
+# One computation per change, fanned out to every open /stream connection
+dashboard_broadcaster = DashboardBroadcaster(
+    compute=lambda: build_dashboard_metrics()[0],
+    debounce=settings.DASHBOARD_STREAM_DEBOUNCE_SECONDS,
+    poll_interval=settings.DASHBOARD_STREAM_POLL_SECONDS,
+    heartbeat=settings.DASHBOARD_STREAM_HEARTBEAT_SECONDS,
+)
+
+@router.get("/stream")
+async def stream_dashboard(request: Request):
+    """
+    Server-Sent Events alternative to polling GET /dashboard/.
+    Sends `event: snapshot` (the full payload) on connect, then `event: delta` frames holding
+    only the sections/fields that changed: {"seq": n, "changes": {...}}, plus
+    `"removed": {section: [field, ...]}` when fields disappeared from a section (e.g. a cleared
+    entry in `errors`).
+    """
+    async def events():
+        async with aclosing(dashboard_broadcaster.subscribe()) as frames:
+            async for frame in frames:
+                if await request.is_disconnected():
+                    break
+                yield frame
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _csv_param(value: str):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+@router.get("/cube")
+def query_dashboard_cube(group_by: str = "zone", zone: str = None, risk_level: str = None,
+                         condition: str = None, start: date = None, end: date = None, vitals: str = None):
+    """
+    Slice and roll-up over the in-memory zone x risk_level x condition x day cube; no DB access.
+    `group_by` is a comma list of dimensions (empty for totals only); `zone`, `risk_level` and
+    `condition` take comma lists of labels; `start`/`end` bound admission days as [start, end).
+    Each cell has `count` and `avg_<vital>`.
+    """
+    dimensions = _csv_param(group_by)
+    unknown = [d for d in dimensions if d not in DIMENSIONS] or \
+              [v for v in _csv_param(vitals) if v not in VITALS]
+    if unknown or len(set(dimensions)) != len(dimensions):
+        raise HTTPException(status_code=400, detail=f"Invalid group_by/vitals: {', '.join(unknown) or group_by}. "
+                                                    f"Dimensions: {', '.join(DIMENSIONS)}; vitals: {', '.join(VITALS)}.")
+    filters = dict(zip(CATEGORY_DIMENSIONS, map(_csv_param, (zone, risk_level, condition))))
+
+    start_time = time.perf_counter()
+    result = analytics_cube.query(dimensions, filters, start, end, _csv_param(vitals) or VITALS)
+    result["elapsedMs"] = round((time.perf_counter() - start_time) * 1000, 3)
+    return result
+
+@router.get("/cube/stats")
+def get_dashboard_cube_stats():
+    return analytics_cube.stats()
+
+@router.get("/census")
+def get_census_series(window: int = None, max_points: int = CENSUS_MAX_POINTS, days_forecast: int = 7,
+                      db: Session = Depends(deps.get_db)):
+    """
+    Census history plus forecast. `window` limits history to the last N days (default: all);
+    the history is downsampled with Largest-Triangle-Three-Buckets to at most `max_points`
+    points, which keeps peaks visible while the payload stays bounded.
+    """
+    if window is not None and window < 1:
+        raise HTTPException(status_code=400, detail="window must be a positive number of days.")
+    if not 3 <= max_points <= CENSUS_MAX_POINTS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"max_points must be between 3 and {CENSUS_MAX_POINTS_LIMIT}.")
+    if not 1 <= days_forecast <= MAX_HORIZON_DAYS:
+        raise HTTPException(status_code=400, detail=f"days_forecast must be between 1 and {MAX_HORIZON_DAYS}.")
+    return get_ai_census_forecast(db, days_forecast, window, max_points)
+
+@router.get("/cache")
+def get_dashboard_cache_stats():
+    return dashboard_cache.stats()
\ No newline at end of file
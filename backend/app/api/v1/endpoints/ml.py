@@ -1,14 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+from typing import List
 from sqlalchemy.orm import Session
-import joblib
 import pandas as pd
 import numpy as np
-import os
 import logging
 import re
+from concurrent.futures import TimeoutError as FuturesTimeout
 
 from app.api import deps
+from app.core.cache import bump_generation
+from app.core.config import settings
+from app.services.background_jobs import job_runner
+from app.services.micro_batcher import MicroBatcher
+from app.services.prediction_cache import prediction_cache
+from app.services.risk_backfill import BACKFILL_CHUNK_SIZE, run_backfill_job
+from app.services.risk_scorer import build_features, risk_scorer
+from app.services.shap_explainer import shap_explainer
+from app.api.v1.endpoints.dashboard import dashboard_broadcaster
 # Import the new training script we just created
 from app.ml.train import train_census_model 
 
@@ -17,20 +26,27 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# --- PATHS ---
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-# Risk Model (Existing)
-RISK_MODEL_PATH = os.path.join(BASE_DIR, "ml", "models", "risk_model.pkl")
-CLASSES_PATH = os.path.join(BASE_DIR, "ml", "models", "classes.pkl")
-
-# --- LOAD RISK MODEL ---
-try:
-    model_pipeline = joblib.load(RISK_MODEL_PATH)
-    classes = joblib.load(CLASSES_PATH)
-    logger.info(" ML Risk Model Loaded.")
-except Exception as e:
-    logger.error(f" ML Risk Model Missing: {e}")
-    model_pipeline = None
+# The risk model is served by `risk_scorer` (one loaded copy, versioned, reloadable), which also
+# keys the prediction and SHAP caches
+
+def score_rows(rows):
+    """
+    Scores a list of single-row feature dicts with one predict_proba call and, when SHAP is
+    enabled, explains them (predicted class) in one TreeSHAP pass. One (probs, shapValues) each.
+    """
+    features = pd.DataFrame(rows)
+    probs = risk_scorer.predict_proba(features)
+    explanations = shap_explainer.explain(features, probs.argmax(axis=1)) \
+        if settings.SHAP_ENABLED else [[] for _ in rows]
+    return list(zip(probs, explanations))
+
+# Shares one model call (and one SHAP pass) between concurrent POST /predict requests
+# (PREDICT_MICROBATCH_ENABLED)
+predict_batcher = MicroBatcher(score_rows,
+                               max_items=settings.PREDICT_MICROBATCH_MAX_ITEMS,
+                               max_wait=settings.PREDICT_MICROBATCH_WINDOW_MS / 1000,
+                               name="predict-batcher")
+PREDICT_BATCHER_TIMEOUT = 4 * settings.PREDICT_MICROBATCH_WINDOW_MS / 1000 + settings.PREDICT_MODEL_BUDGET_SECONDS
 
 # --- INPUT SCHEMA ---
 class PredictionInput(BaseModel):
@@ -44,6 +60,12 @@ class PredictionInput(BaseModel):
     bmi: float
     clinicalNotes: str = "" 
 
+class PredictionBatchInput(BaseModel):
+    inputs: List[PredictionInput]
+    explain: bool = False
+
+PREDICT_BATCH_MAX = 5000
+
 # --- NLP ENGINE (Rule-Based) ---
 def extract_clinical_entities(text):
     if not text: return [], "No clinical notes provided."
@@ -77,7 +99,8 @@ def extract_clinical_entities(text):
 # ==========================
 @router.post("/predict")
 def predict_risk(input_data: PredictionInput):
-    if model_pipeline is None:
+    risk_scorer.reload_if_changed(settings.RISK_MODEL_RELOAD_CHECK_SECONDS)
+    if not risk_scorer.loaded:
         raise HTTPException(status_code=503, detail="Risk Model not loaded.")
 
     try:
@@ -89,7 +112,7 @@ def predict_risk(input_data: PredictionInput):
         shock_index = input_data.heartRate / sys_bp if sys_bp > 0 else 0
         gender_code = 1 if input_data.gender.lower() in ['m', 'male'] else 0
 
-        features = pd.DataFrame([{
+        features = {
             'age': input_data.age,
             'gender': gender_code,
             'sys_bp': sys_bp,
@@ -101,35 +124,162 @@ def predict_risk(input_data: PredictionInput):
             'pulse_pressure': pulse_pressure,
             'map': map_val,
             'shock_index': shock_index
-        }])
+        }
 
-        # Prediction
-        pred_idx = model_pipeline.predict(features)[0]
-        probs = model_pipeline.predict_proba(features)[0]
+        # Same vitals, notes and model as an earlier request: answer from memory
+        cache_key = None
+        if settings.PREDICT_CACHE_ENABLED:
+            cache_key = prediction_cache.make_key(features, risk_scorer.version, input_data.clinicalNotes,
+                                                  settings.SHAP_ENABLED)
+            cached = prediction_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Prediction (one model pass; the class is the arg-max of the probabilities) and real
+        # TreeSHAP attributions for the predicted class (cached by quantised features)
+        if settings.PREDICT_MICROBATCH_ENABLED:
+            try:
+                probs, shap_values = predict_batcher(features, timeout=PREDICT_BATCHER_TIMEOUT)
+            except FuturesTimeout:
+                raise HTTPException(status_code=503, detail="Risk model busy, please retry.")
+        else:
+            probs, shap_values = score_rows([features])[0]
+        pred_idx = int(np.argmax(probs))
         
         # NLP Analysis
         nlp_entities, nlp_summary = extract_clinical_entities(input_data.clinicalNotes)
 
-        return {
-            "riskLevel": classes[pred_idx],
+        result = {
+            "riskLevel": str(risk_scorer.classes[pred_idx]),
             "riskScore": int(np.max(probs) * 100),
             "readmissionProbability": int(probs[1] * 100) if len(probs) > 1 else 0,
             "suggestedInterventions": ["Continuous vitals monitoring", "Review meds", "Sepsis protocol check"],
-            "shapValues": [
-                {"feature": "Pulse Pressure", "value": round(pulse_pressure, 1)},
-                {"feature": "MAP", "value": round(map_val, 1)},
-                {"feature": "SPO2", "value": -15 if input_data.spo2 < 95 else 5},
-            ],
+            "shapValues": shap_values,
             "nlpAnalysis": {
                 "entities": nlp_entities,
                 "summary": nlp_summary
             }
         }
+        if cache_key is not None:
+            prediction_cache.put(cache_key, result)
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Prediction Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/predict/batch")
+def predict_risk_batch(payload: PredictionBatchInput):
+    """
+    Scores up to PREDICT_BATCH_MAX inputs with one vectorized feature pass and a single
+    `predict_proba` call (e.g. rescoring a whole ward). Results are in input order and use
+    the same riskLevel / riskScore / readmissionProbability mapping as POST /predict.
+    With `explain`, each result also gets `shapValues`, computed in one TreeSHAP pass for the
+    rows not already cached.
+    """
+    if len(payload.inputs) > PREDICT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_BATCH_MAX} inputs per request.")
+    risk_scorer.reload_if_changed(settings.RISK_MODEL_RELOAD_CHECK_SECONDS)
+    if not risk_scorer.loaded:
+        raise HTTPException(status_code=503, detail="Risk Model not loaded.")
+    if not payload.inputs:
+        return {"count": 0, "modelVersion": risk_scorer.version, "results": []}
+
+    try:
+        vitals = pd.DataFrame({
+            'age': [item.age for item in payload.inputs],
+            'gender': [item.gender for item in payload.inputs],
+            'sys_bp': [item.systolicBp for item in payload.inputs],
+            'dia_bp': [item.diastolicBp for item in payload.inputs],
+            'heart_rate': [item.heartRate for item in payload.inputs],
+            'spo2': [item.spo2 for item in payload.inputs],
+            'temp': [item.temp for item in payload.inputs],
+            'bmi': [item.bmi for item in payload.inputs],
+        })
+        features = build_features(vitals)
+        probs = risk_scorer.predict_proba(features)
+        best = probs.argmax(axis=1)
+        levels = risk_scorer.classes[best]
+        scores = (probs.max(axis=1) * 100).astype(int)
+        readmission = (probs[:, 1] * 100).astype(int) if probs.shape[1] > 1 else np.zeros(len(probs), dtype=int)
+        explanations = shap_explainer.explain(features, best) if payload.explain else None
+    except Exception as e:
+        logger.error(f"Batch Prediction Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results = []
+    for i, (item, level, score, readmit) in enumerate(zip(payload.inputs, levels.tolist(), scores.tolist(),
+                                                          readmission.tolist())):
+        nlp_entities, nlp_summary = extract_clinical_entities(item.clinicalNotes)
+        result = {
+            "riskLevel": level,
+            "riskScore": score,
+            "readmissionProbability": readmit,
+            "nlpAnalysis": {"entities": nlp_entities, "summary": nlp_summary},
+        }
+        if explanations is not None:
+            result["shapValues"] = explanations[i]
+        results.append(result)
+    return {"count": len(results), "modelVersion": risk_scorer.version, "results": results}
+
+@router.get("/predict/batcher")
+def get_predict_batcher_stats():
+    """Micro-batcher metrics for POST /predict: batch-size histogram and queueing delay."""
+    return {"enabled": settings.PREDICT_MICROBATCH_ENABLED, **predict_batcher.stats()}
+
+@router.get("/predict/cache")
+def get_prediction_cache_stats():
+    """POST /predict response cache: hit ratio, entries and approximate memory use."""
+    return {"enabled": settings.PREDICT_CACHE_ENABLED, **prediction_cache.stats()}
+
+@router.get("/predict/explainer")
+def get_explainer_stats():
+    """SHAP explanation cache for /predict: hit rate, size and the model version it explains."""
+    return {"enabled": settings.SHAP_ENABLED, **shap_explainer.stats()}
+
+@router.post("/predict/reload")
+def reload_risk_model():
+    """Picks up a replaced risk model artifact now instead of at the next throttled check."""
+    reloaded = risk_scorer.reload_if_changed()
+    if not risk_scorer.loaded:
+        raise HTTPException(status_code=503, detail="Risk Model not loaded.")
+    return {"reloaded": reloaded, "modelVersion": risk_scorer.version}
+
+BACKFILL_MIN_CHUNK = 1000
+BACKFILL_MAX_CHUNK = 200000
+
+@router.post("/backfill", status_code=202)
+def start_risk_backfill(after_id: str = "", until_id: str = None, chunk_size: int = BACKFILL_CHUNK_SIZE):
+    """
+    Rescores stored patients (after_id < id <= until_id, default: all) with the trained risk model
+    in the background and returns the job. Poll GET /ml/backfill/{job_id}; progress.last_id is
+    the resume point if the job fails.
+    """
+    if not risk_scorer.loaded:
+        raise HTTPException(status_code=503, detail="Risk Model not loaded.")
+    if not BACKFILL_MIN_CHUNK <= chunk_size <= BACKFILL_MAX_CHUNK:
+        raise HTTPException(status_code=400,
+                            detail=f"chunk_size must be between {BACKFILL_MIN_CHUNK} and {BACKFILL_MAX_CHUNK}.")
+    if until_id and after_id and until_id <= after_id:
+        raise HTTPException(status_code=400, detail="until_id must be greater than after_id.")
+
+    job = job_runner.submit("risk_backfill", run_backfill_job, after_id, until_id, chunk_size,
+                            after_id=after_id, until_id=until_id, model_version=risk_scorer.version)
+    return job.to_dict()
+
+@router.get("/backfill")
+def list_risk_backfill_jobs():
+    return [job.to_dict() for job in job_runner.list(kind="risk_backfill")]
+
+@router.get("/backfill/{job_id}")
+def get_risk_backfill_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None or job.kind != "risk_backfill":
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return job.to_dict()
+
 # ==========================
 # 2. FORECAST TRAINING ENDPOINT (NEW)
 # ==========================
@@ -143,7 +293,10 @@ def trigger_training(db: Session = Depends(deps.get_db)):
         success = train_census_model(db)
         if not success:
             raise HTTPException(status_code=400, detail="Not enough data to train model (Need 10+ days)")
-        
+
+        # The forecast service reloads the new artifact on its own; this makes cached dashboards refresh now
+        bump_generation()
+        dashboard_broadcaster.wake()
         return {"status": "success", "message": "Census Forecasting Model trained and saved successfully "}
     except Exception as e:
         print(f"Training Error: {e}")
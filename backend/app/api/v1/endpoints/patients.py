@@ -1,16 +1,31 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, tuple_, bindparam, insert
+from sqlalchemy.dialects import postgresql, sqlite
+import base64
 import csv
 import io
+import json
+import os
+import shutil
+import uuid
+import zlib
+import pandas as pd
 from fastapi.responses import StreamingResponse
 from datetime import datetime
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_db, SessionLocal
 from app.models.patient import Patient
+from app.services.background_jobs import job_runner
+from app.services.census_rollup import census_rollup
+from app.services.data_ingestion import run_ingestion_job
+from app.services.patient_events import notify_patients_changed
+from app.services.patient_search import patient_search
+from app.services.risk_scorer import risk_scorer
 # Assuming you have schemas defined, otherwise we use dicts/Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 router = APIRouter()
 
@@ -33,35 +48,119 @@ class PatientCreate(BaseModel):
     risk_level: str = "Low"
     zone: str = "General Ward"
 
+class PatientBulkCreate(BaseModel):
+    # Rows are validated one by one so a bad row is reported instead of rejecting the batch
+    patients: List[Dict[str, Any]]
+    score: bool = False  # overwrite risk_score/risk_level with the risk model's prediction
+
+BULK_MAX_ROWS = 10000
+BULK_ID_ATTEMPTS = 3
+
+def new_patient_id() -> str:
+    # 48 random bits; bulk inserts still retry the (vanishingly rare) collision
+    return f"PAT-{uuid.uuid4().hex[:12].upper()}"
+
+# sort_by -> (sort column, descending). Each has a matching (column, id) index on Patient.
+SORT_KEYS = {
+    "date": (Patient.admission_date, True),
+    "risk_desc": (Patient.risk_score, True),
+    "risk_asc": (Patient.risk_score, False),
+}
+
+def encode_cursor(sort_by: str, value, patient_id: str) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, value, patient_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_by: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, patient_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(patient_id, str):
+            raise TypeError("cursor id must be a string")
+        if value is None:
+            # Issued inside the tail of rows without a sort value
+            pass
+        elif cursor_sort == "date":
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError("cursor sort value must be a number")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if cursor_sort != sort_by:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    return value, patient_id
+
+def apply_patient_filters(query, search: str, risk_level: str, bind):
+    """Search + risk filters shared by the listing and the CSV export."""
+    # Name substring or ID prefix, index-backed
+    if search.strip():
+        query = query.filter(patient_search.clause(search, bind))
+    if risk_level and risk_level != "All":
+        query = query.filter(Patient.risk_level == risk_level)
+    return query
+
 @router.get("/")
 def get_patients(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     search: str = "",
     risk_level: str = "",
     sort_by: str = "date",
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(Patient)
+    """
+    Two paging modes:
+    - `cursor` (preferred): keyset seek on (sort key, id), constant cost at any depth.
+    - `skip` (legacy): OFFSET paging, kept for compatibility.
+    Rows without a sort value (NULL admission date or risk score) come last, in id order.
+    A full page always returns the next page's cursor in the `X-Next-Cursor` header.
+    """
+    if sort_by not in SORT_KEYS:
+        # Default to newest admissions
+        sort_by = "date"
+    sort_column, descending = SORT_KEYS[sort_by]
 
-    # 1. Search Filter
-    if search:
-        query = query.filter(Patient.name.ilike(f"%{search}%"))
-    
-    # 2. Risk Filter
-    if risk_level and risk_level != "All":
-        query = query.filter(Patient.risk_level == risk_level)
+    # 1-2. Search + Risk Filters
+    query = apply_patient_filters(db.query(Patient), search, risk_level, db.get_bind())
 
-    # 3. Sorting
-    if sort_by == "risk_desc":
-        query = query.order_by(desc(Patient.risk_score))
-    elif sort_by == "risk_asc":
-        query = query.order_by(Patient.risk_score)
-    else:
-        # Default to newest admissions
-        query = query.order_by(desc(Patient.admission_date))
+    # 3-4. Sorting (id breaks ties so the order is total and cursors are unambiguous) and paging
+    def by_id(q):
+        return q.order_by(desc(Patient.id) if descending else Patient.id)
 
-    return query.offset(skip).limit(limit).all()
+    # Rows with a sort value come first, then the NULL tail. Each part follows the (column, id)
+    # index; a single NULLS LAST ordering could not use it on PostgreSQL when descending.
+    value, last_id = decode_cursor(cursor, sort_by) if cursor else (None, None)
+    in_tail = cursor is not None and value is None
+    offset = 0 if cursor else skip
+    present = query.filter(sort_column.isnot(None))
+    patients = []
+    if not in_tail:
+        head = present
+        if cursor:
+            seek_key = tuple_(sort_column, Patient.id)
+            after = tuple_(bindparam(None, value, type_=sort_column.type),
+                           bindparam(None, last_id, type_=Patient.id.type))
+            head = head.filter(seek_key < after if descending else seek_key > after)
+        head = by_id(head.order_by(desc(sort_column) if descending else sort_column))
+        patients = (head.offset(offset) if offset else head).limit(limit).all()
+    if len(patients) < limit:
+        tail = query.filter(sort_column.is_(None))
+        if in_tail:
+            tail = tail.filter(Patient.id < last_id if descending else Patient.id > last_id)
+        tail = by_id(tail)
+        if offset and not patients:
+            # The OFFSET page starts inside the tail: skip what is left after the rows with a value
+            tail = tail.offset(offset - present.count())
+        patients += tail.limit(limit - len(patients)).all()
+
+    if patients and len(patients) == limit:
+        last = patients[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(sort_by, getattr(last, sort_column.key), last.id)
+    return patients
 
 @router.post("/")
 def create_patient(patient_in: PatientCreate, db: Session = Depends(get_db)):
@@ -70,13 +169,8 @@ def create_patient(patient_in: PatientCreate, db: Session = Depends(get_db)):
     This prevents the "vitals is invalid keyword" error.
     """
     try:
-        # Create unique ID if needed, or let DB handle it if auto-increment
-        # Assuming ID is a string like 'PAT-123' based on previous context
-        import random
-        new_id = f"PAT-{random.randint(1000000, 9999999)}"
-
         db_patient = Patient(
-            id=new_id,
+            id=new_patient_id(),
             name=patient_in.name,
             age=patient_in.age,
             gender=patient_in.gender,
@@ -98,7 +192,10 @@ def create_patient(patient_in: PatientCreate, db: Session = Depends(get_db)):
         )
         
         db.add(db_patient)
+        census_rollup.record_added(db, [db_patient.admission_date], [db_patient.zone])
+        added = [{**patient_in.model_dump(), "admission_date": db_patient.admission_date}]
         db.commit()
+        notify_patients_changed(1, added)
         db.refresh(db_patient)
         return db_patient
 
@@ -107,53 +204,179 @@ def create_patient(patient_in: PatientCreate, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/export_csv")
-def export_patients_csv(db: Session = Depends(get_db)):
+EXPORT_COLUMNS = [
+    ("ID", Patient.id), ("Name", Patient.name), ("Age", Patient.age), ("Gender", Patient.gender),
+    ("Condition", Patient.condition), ("Zone", Patient.zone), ("Admission Date", Patient.admission_date),
+    ("Sys BP", Patient.sys_bp), ("Dia BP", Patient.dia_bp), ("Heart Rate", Patient.heart_rate),
+    ("SPO2", Patient.spo2), ("Temp", Patient.temp), ("BMI", Patient.bmi),
+    ("Risk Score", Patient.risk_score), ("Risk Level", Patient.risk_level),
+]
+EXPORT_BATCH_ROWS = 5000
+
+def stream_patients_csv(search: str, risk_level: str, compress: bool):
     """
-    FIXED: Accesses flat columns (p.sys_bp) instead of p.vitals
+    Yields the export in batches of EXPORT_BATCH_ROWS rows straight off a server-side cursor,
+    so memory stays flat from 1k to 1M patients. Runs on its own session because the response
+    body is produced after the request's `get_db` session has been closed.
     """
+    db = SessionLocal()
+    gzipper = zlib.compressobj(wbits=31) if compress else None  # wbits=31 -> gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return gzipper.compress(data) if gzipper else data
+
     try:
-        patients = db.query(Patient).limit(1000).all()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write Headers
-        headers = [
-            "ID", "Name", "Age", "Gender", "Condition", "Zone", 
-            "Admission Date", "Sys BP", "Dia BP", "Heart Rate", 
-            "SPO2", "Temp", "BMI", "Risk Score", "Risk Level"
-        ]
-        writer.writerow(headers)
-        
-        # Write Rows
-        for p in patients:
-            writer.writerow([
-                p.id,
-                p.name,
-                p.age,
-                p.gender,
-                p.condition,
-                p.zone,
-                p.admission_date,
-                # FIX: Access attributes directly
-                p.sys_bp, 
-                p.dia_bp, 
-                p.heart_rate,
-                p.spo2,
-                p.temp,
-                p.bmi,
-                p.risk_score,
-                p.risk_level
-            ])
-            
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=patients_export_{datetime.now().strftime('%Y%m%d')}.csv"}
-        )
+        writer.writerow([header for header, _ in EXPORT_COLUMNS])
+        yield flush()
 
+        query = db.query(*[column for _, column in EXPORT_COLUMNS])
+        query = apply_patient_filters(query, search, risk_level, db.get_bind()).order_by(Patient.id)
+        result = db.execute(query.statement.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        for batch in result.partitions():
+            writer.writerows(batch)
+            chunk = flush()
+            if chunk:
+                yield chunk
+        if gzipper:
+            yield gzipper.flush()
     except Exception as e:
+        # Headers are already sent, so the client just sees a truncated file; log the cause
         print(f" Export CSV Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate CSV: {str(e)}")
\ No newline at end of file
+        raise
+    finally:
+        db.close()
+
+@router.post("/bulk")
+def create_patients_bulk(payload: PatientBulkCreate, db: Session = Depends(get_db)):
+    """
+    Creates up to BULK_MAX_ROWS patients in one request: rows are validated individually,
+    optionally scored in a single vectorized model pass, and inserted with multi-row
+    INSERTs inside one transaction. Returns a status per input row, in input order.
+    """
+    if len(payload.patients) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} patients per request.")
+    if payload.score and not risk_scorer.loaded:
+        raise HTTPException(status_code=503, detail="Risk Model not loaded.")
+
+    results = [None] * len(payload.patients)
+    valid_rows, valid_index = [], []
+    for i, raw in enumerate(payload.patients):
+        try:
+            valid_rows.append(PatientCreate.model_validate(raw).model_dump())
+            valid_index.append(i)
+        except ValidationError as e:
+            errors = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+            results[i] = {"index": i, "status": "invalid", "errors": errors}
+
+    if valid_rows:
+        try:
+            if payload.score:
+                levels, scores = risk_scorer.score(pd.DataFrame(valid_rows))
+                for row, level, score in zip(valid_rows, levels, scores):
+                    row["risk_level"], row["risk_score"] = str(level), float(score)
+
+            admitted = datetime.now()
+            for row in valid_rows:
+                row["id"] = new_patient_id()
+                row["admission_date"] = admitted
+            insert_patients_without_collisions(db, valid_rows)
+            census_rollup.record_added(db, [admitted] * len(valid_rows), [row["zone"] for row in valid_rows])
+            db.commit()
+            notify_patients_changed(len(valid_rows), valid_rows)
+        except Exception as e:
+            print(f"❌ Bulk Create Error: {e}")
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+        for i, row in zip(valid_index, valid_rows):
+            results[i] = {"index": i, "status": "created", "id": row["id"],
+                          "riskScore": row["risk_score"], "riskLevel": row["risk_level"]}
+
+    return {
+        "created": len(valid_rows),
+        "failed": len(payload.patients) - len(valid_rows),
+        "results": results,
+    }
+
+def insert_patients_without_collisions(db: Session, rows: List[dict]):
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING id (batched into multi-row VALUES by SQLAlchemy).
+    Rows whose id was already taken get a fresh id and are retried; ids are written back into `rows`.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        db.execute(insert(Patient), rows)
+        return
+
+    dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = dialect_insert(Patient).on_conflict_do_nothing(index_elements=[Patient.id]).returning(Patient.id)
+    pending = rows
+    for _ in range(BULK_ID_ATTEMPTS):
+        inserted = set(db.execute(stmt, pending).scalars())
+        pending = [row for row in pending if row["id"] not in inserted]
+        if not pending:
+            return
+        for row in pending:
+            row["id"] = new_patient_id()
+    raise RuntimeError(f"Could not allocate unique ids for {len(pending)} patients")
+
+@router.get("/export_csv")
+def export_patients_csv(search: str = "", risk_level: str = "", gzip: bool = False):
+    """
+    Streams every patient matching the same `search` / `risk_level` filters as GET /patients.
+    `gzip=true` returns a .csv.gz instead.
+    """
+    filename = f"patients_export_{datetime.now().strftime('%Y%m%d')}.csv"
+    if gzip:
+        filename += ".gz"
+    return StreamingResponse(
+        stream_patients_csv(search, risk_level, gzip),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+@router.post("/ingest", status_code=202)
+def ingest_patients_csv(file: UploadFile = File(...)):
+    """
+    Accepts a patients CSV and loads it in the background.
+    The upload is copied to disk in 1 MB blocks (never held in memory) and a job id is
+    returned immediately; poll GET /patients/ingest/{job_id} for progress.
+    """
+    if not (file.filename or "").lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only .csv uploads are supported.")
+
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    staged_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4().hex}.csv")
+    try:
+        # Sync endpoint -> runs in the threadpool, so the copy never blocks the event loop
+        with open(staged_path, "wb") as out:
+            shutil.copyfileobj(file.file, out, UPLOAD_BLOCK_SIZE)
+    except Exception as e:
+        print(f"❌ Upload Error: {e}")
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+        raise HTTPException(status_code=500, detail=f"Failed to store upload: {str(e)}")
+    finally:
+        file.file.close()
+
+    job = job_runner.submit("ingest", run_ingestion_job, staged_path,
+                            filename=file.filename, bytes=os.path.getsize(staged_path))
+    return job.to_dict()
+
+@router.get("/ingest")
+def list_ingestion_jobs():
+    return [job.to_dict() for job in job_runner.list(kind="ingest")]
+
+@router.get("/ingest/{job_id}")
+def get_ingestion_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None or job.kind != "ingest":
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job.to_dict()
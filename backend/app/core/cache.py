@@ -0,0 +1,224 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+# --- Write generation ---------------------------------------------------------
+# Every patient write bumps this counter (see app/services/patient_events.py). Cached values
+# remember the generation they were computed at, so one increment invalidates them all.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def bump_generation() -> int:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _generation
+
+
+def current_generation() -> int:
+    return _generation
+
+
+# Set while a loader runs. Nested cached calls made by a loader must not hand back stale values,
+# or the outer result would be stored as fresh while built from invalidated parts.
+_loading = threading.local()
+
+
+class _Entry:
+    __slots__ = ("value", "generation", "stored_at")
+
+    def __init__(self, value, generation, stored_at):
+        self.value = value
+        self.generation = generation
+        self.stored_at = stored_at
+
+
+class _InFlight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with TTL expiry, generation-based invalidation and stale-while-revalidate.
+
+    - fresh  (same generation, younger than `ttl`): served from memory.
+    - stale  (expired or invalidated, but younger than `ttl + stale_ttl`): served from memory
+             while a background thread recomputes it; the request never waits on the refresh.
+    - missing / too old: computed inline. Concurrent misses on one key share a single load.
+
+    Loaders take a DB session. Inline loads use the caller's session; background refreshes
+    open their own, because the request's session is closed by the time they run.
+    """
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: int, refresh_workers: int = 2):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f"{name}-refresh")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0,
+                       "refresh_errors": 0, "evictions": 0}
+
+    def get_or_load(self, key, loader, db=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if entry.generation == _generation and age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                if age < self.ttl + self.stale_ttl and not getattr(_loading, "depth", 0):
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, loader)
+                    return entry.value
+            self._stats["misses"] += 1
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _InFlight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            # Someone is already computing this key: wait for their result instead of repeating the work
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            generation = _generation
+            flight.value = _run_loader(loader, db)
+            self._store(key, flight.value, generation)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "generation": _generation,
+                **self._stats,
+                "hit_ratio": round((self._stats["hits"] + self._stats["stale_hits"]) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _refresh(self, key, loader):
+        # Generation is read before loading: a write that lands mid-refresh leaves the result stale
+        generation = _generation
+        db = SessionLocal()
+        try:
+            self._store(key, _run_loader(loader, db), generation)
+            with self._lock:
+                self._stats["refreshes"] += 1
+        except Exception as e:
+            print(f"⚠️ Cache refresh failed ({self.name}/{key}): {e}")
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            self._entries[key] = _Entry(value, generation, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def memoize(self, name: str, uses_db: bool = True):
+        """
+        Caches a function (or method) by `name` plus its arguments. With `uses_db`, the wrapped
+        function takes the session as its first argument after `self`; it is left out of the key.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if uses_db:
+                    # (self, db, ...) for methods, (db, ...) for functions
+                    db_index = 1 if args and not _is_session(args[0]) else 0
+                    head, db, rest = args[:db_index], args[db_index], args[db_index + 1:]
+                else:
+                    head, db, rest = (), None, args
+                key = (name,) + tuple(rest) + tuple(sorted(kwargs.items()))
+                if uses_db:
+                    loader = lambda session: fn(*head, session, *rest, **kwargs)
+                else:
+                    loader = lambda session: fn(*rest, **kwargs)
+                return self.get_or_load(key, loader, db)
+            wrapper.uncached = fn
+            return wrapper
+        return decorator
+
+
+@contextmanager
+def fresh_reads():
+    """Within this block cached lookups never return stale values (they reload inline instead)."""
+    _loading.depth = getattr(_loading, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _loading.depth -= 1
+
+
+def reading_fresh() -> bool:
+    """
+    True inside `fresh_reads()` (or a loader) on this thread. The flag is thread-local, so code
+    that hands cached reads to worker threads must pass it along and re-enter `fresh_reads()`.
+    """
+    return getattr(_loading, "depth", 0) > 0
+
+
+def _run_loader(loader, db):
+    _loading.depth = getattr(_loading, "depth", 0) + 1
+    try:
+        return loader(db)
+    finally:
+        _loading.depth -= 1
+
+
+def _is_session(obj) -> bool:
+    return hasattr(obj, "execute") and hasattr(obj, "commit")
+
+
+# Dashboard payload + AnalyticsEngine sections
+dashboard_cache = TTLCache(
+    "dashboard",
+    ttl=settings.DASHBOARD_CACHE_TTL_SECONDS,
+    stale_ttl=settings.DASHBOARD_CACHE_STALE_SECONDS,
+    max_entries=settings.DASHBOARD_CACHE_MAX_ENTRIES,
+)
@@ -10,6 +10,56 @@ class Settings(BaseSettings):
     # Default is SQLite only as a fallback if .env is missing
     DATABASE_URL: str = "sqlite:///./optihealth.db"
 
+    # Uploaded CSVs are staged here until the background ingestion job has loaded them
+    UPLOAD_DIR: str = "data/uploads"
+
+    # Dashboard cache: entries are fresh for TTL seconds, then served stale (while a background
+    # refresh runs) for up to STALE more seconds. A patient write marks every entry stale at once,
+    # so the first read after it may still get the old value while the refresh runs; later reads
+    # see the new data. Use `fresh_reads()` where a read must reflect the write.
+    DASHBOARD_CACHE_TTL_SECONDS: float = 30.0
+    DASHBOARD_CACHE_STALE_SECONDS: float = 300.0
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 256
+    # Dashboard sections run concurrently; a section slower than the timeout is returned empty
+    DASHBOARD_SECTION_TIMEOUT_SECONDS: float = 5.0
+    DASHBOARD_SECTION_WORKERS: int = 6
+    # GET /dashboard/stream (SSE): writes are coalesced for DEBOUNCE seconds before one recompute;
+    # POLL catches changes made by other processes; HEARTBEAT keeps idle connections open
+    DASHBOARD_STREAM_DEBOUNCE_SECONDS: float = 1.0
+    DASHBOARD_STREAM_POLL_SECONDS: float = 15.0
+    DASHBOARD_STREAM_HEARTBEAT_SECONDS: float = 20.0
+    # In-memory analytics cube (GET /dashboard/cube): rebuilt in the background once older than this,
+    # which is how writes made by other processes (ingest scripts) reach it
+    DASHBOARD_CUBE_REFRESH_SECONDS: float = 300.0
+    # Days the cube's day axis may span, ending tomorrow; rows admitted outside it (typos such as
+    # 1900 or 2205) are left out rather than padding the arrays with years of empty days
+    DASHBOARD_CUBE_MAX_DAYS: int = 3660
+
+    # POST /ml/predict micro-batching (opt-in): concurrent requests arriving within WINDOW_MS of
+    # the first one, up to MAX_ITEMS, share one predict_proba call. Adds at most WINDOW_MS latency.
+    PREDICT_MICROBATCH_ENABLED: bool = False
+    PREDICT_MICROBATCH_WINDOW_MS: float = 2.0
+    PREDICT_MICROBATCH_MAX_ITEMS: int = 64
+    # A request waits at most 4 windows + MODEL_BUDGET for its batch (one full batch ahead of it,
+    # model + SHAP misses included), then gets 503 instead of hanging on a stalled worker
+    PREDICT_MODEL_BUDGET_SECONDS: float = 2.0
+
+    # SHAP attributions for /ml/predict: LRU of explanations keyed by the feature vector rounded
+    # to QUANTIZE_DECIMALS (a miss costs one TreeSHAP pass, ~9 ms per row for the risk model)
+    SHAP_ENABLED: bool = True
+    SHAP_CACHE_SIZE: int = 20000
+    SHAP_QUANTIZE_DECIMALS: int = 2
+
+    # /ml/predict and /ml/predict/batch stat() the risk model artifact at most this often and
+    # reload it when it changed; the new version drops the prediction cache and rebuilds SHAP
+    RISK_MODEL_RELOAD_CHECK_SECONDS: float = 10.0
+
+    # POST /ml/predict response cache (engineered features + model version + notes hash)
+    PREDICT_CACHE_ENABLED: bool = True
+    PREDICT_CACHE_TTL_SECONDS: float = 3600.0
+    PREDICT_CACHE_MAX_ENTRIES: int = 50000
+    PREDICT_CACHE_MAX_MB: float = 64.0
+
     # Security
     SECRET_KEY: str = "supersecretkey123"
     
@@ -0,0 +1,107 @@
+import logging
+from sqlalchemy import text
+from app.db.base_class import Base
+
+logger = logging.getLogger(__name__)
+
+# SQLite shadow table for substring search on patients.name (external content -> no copy of the data)
+SQLITE_NAME_FTS_TABLE = "patients_name_fts"
+
+SQLITE_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE {SQLITE_NAME_FTS_TABLE}
+        USING fts5(name, content='patients', content_rowid='rowid', tokenize='trigram')""",
+    # Triggers keep the index in sync for every write path (ORM, Core upserts, executemany loader)
+    f"""CREATE TRIGGER IF NOT EXISTS patients_name_fts_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO {SQLITE_NAME_FTS_TABLE}(rowid, name) VALUES (new.rowid, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_name_fts_ad AFTER DELETE ON patients BEGIN
+        INSERT INTO {SQLITE_NAME_FTS_TABLE}({SQLITE_NAME_FTS_TABLE}, rowid, name) VALUES ('delete', old.rowid, old.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_name_fts_au AFTER UPDATE OF name ON patients BEGIN
+        INSERT INTO {SQLITE_NAME_FTS_TABLE}({SQLITE_NAME_FTS_TABLE}, rowid, name) VALUES ('delete', old.rowid, old.name);
+        INSERT INTO {SQLITE_NAME_FTS_TABLE}(rowid, name) VALUES (new.rowid, new.name);
+    END""",
+    # Index whatever rows already exist
+    f"INSERT INTO {SQLITE_NAME_FTS_TABLE}({SQLITE_NAME_FTS_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Serves name ILIKE '%term%'
+    "CREATE INDEX IF NOT EXISTS ix_patients_name_trgm ON patients USING gin (name gin_trgm_ops)",
+]
+
+POSTGRES_ID_PREFIX_DDL = [
+    # Serves id LIKE 'PAT-12%' regardless of the database collation
+    "CREATE INDEX IF NOT EXISTS ix_patients_id_pattern ON patients (id text_pattern_ops)",
+]
+
+
+def ensure_indexes(engine):
+    """
+    `create_all` only builds indexes together with brand-new tables, so indexes added to a
+    model later never reach an existing database. Create any that are missing.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    ensure_search_index(engine)
+
+
+def ensure_search_index(engine):
+    """
+    Builds the patient search structures for the current dialect:
+    - PostgreSQL: pg_trgm GIN index on name + text_pattern_ops index on id
+    - SQLite: FTS5 trigram shadow table on name, maintained by triggers
+    Failures are logged, not raised: search then falls back to an unindexed scan.
+    """
+    try:
+        if engine.dialect.name == "postgresql":
+            # Separate transactions: a missing pg_trgm must not roll back the id index
+            with engine.begin() as conn:
+                for ddl in POSTGRES_ID_PREFIX_DDL:
+                    conn.execute(text(ddl))
+            with engine.begin() as conn:
+                for ddl in POSTGRES_SEARCH_DDL:
+                    conn.execute(text(ddl))
+        elif engine.dialect.name == "sqlite":
+            with engine.begin() as conn:
+                has_trigger = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'patients_name_fts_ai'")
+                ).first() is not None
+                if _sqlite_fts_exists(conn) and not has_trigger:
+                    # `patients` was dropped and recreated: its triggers went with it, the shadow table did not
+                    conn.execute(text(f"DROP TABLE {SQLITE_NAME_FTS_TABLE}"))
+                if not has_trigger:
+                    for ddl in SQLITE_SEARCH_DDL:
+                        conn.execute(text(ddl))
+    except Exception as e:
+        logger.warning(f"⚠️ Patient search index unavailable, falling back to sequential scans: {e}")
+
+
+def rebuild_search_index(engine):
+    """Re-derives the SQLite FTS shadow table from `patients` (e.g. after a VACUUM renumbered rowids)."""
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {SQLITE_NAME_FTS_TABLE}({SQLITE_NAME_FTS_TABLE}) VALUES ('rebuild')"))
+    elif engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("REINDEX INDEX ix_patients_name_trgm"))
+
+
+def search_index_available(engine) -> bool:
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            return _sqlite_fts_exists(conn)
+        if engine.dialect.name == "postgresql":
+            return conn.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_patients_name_trgm'")
+            ).first() is not None
+    return False
+
+
+def _sqlite_fts_exists(conn) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": SQLITE_NAME_FTS_TABLE}
+    ).first() is not None
@@ -6,15 +6,24 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.endpoints import patients, ml, dashboard, governance, auth, support
 
 # --- Imports for Database Creation ---
-from app.db.session import engine
+from app.db.session import engine, SessionLocal
 from app.db.base_class import Base
+from app.db.indexes import ensure_indexes
+from app.services.analytics_cube import analytics_cube
+from app.services.census_rollup import census_rollup
 
 # *** CRITICAL: Import ALL models here so SQLAlchemy detects them ***
 from app.models.user import User
 from app.models.patient import Patient 
+from app.models.daily_census import DailyCensus
 
 # Create Database Tables
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine)
+with SessionLocal() as _db:
+    census_rollup.ensure_populated(_db)
+# First /dashboard/cube request waits for this instead of starting its own scan
+analytics_cube.rebuild_in_background()
 
 app = FastAPI(title="OptiHealth API", version="2.0.0")
 
@@ -36,6 +45,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # X-Next-Cursor: keyset pagination cursor for GET /patients; Server-Timing: dashboard section timings
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 # --- Register Routers ---
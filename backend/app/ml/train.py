@@ -1,26 +1,19 @@
 import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from app.services.census_rollup import census_rollup
+from app.services.forecast_service import CENSUS_MODEL_PATH
 from prophet import Prophet
 import joblib
-import os
 from datetime import datetime
 
-# Define where to save the model
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "census_model.joblib")
+# Define where to save the model (the same file the forecast service serves from)
+MODEL_PATH = CENSUS_MODEL_PATH
 
 def train_census_model(db: Session):
     print("🧠 Starting Model Training...")
 
-    # 1. Fetch Data
-    query = text("""
-        SELECT date(admission_date) as ds, count(*) as y 
-        FROM patients 
-        GROUP BY date(admission_date) 
-        ORDER BY date(admission_date) ASC
-    """)
-    result = db.execute(query)
-    rows = result.fetchall()
+    # 1. Fetch Data (daily admissions from the census rollup)
+    rows = census_rollup.daily_totals(db)
 
     if len(rows) < 5:
         print("⚠️ Not enough data to train. Skipping.")
@@ -0,0 +1,237 @@
+"""
+Pure-NumPy evaluator for the risk model pipeline (StandardScaler + XGBClassifier, multi:softprob).
+
+`TreeEnsemble.from_pipeline` exports the scaler and every boosted tree once into flat arrays;
+`predict_proba` then scores a whole batch without pandas, DMatrix or sklearn.
+
+Each tree is padded to a complete binary tree of the ensemble's depth D, so children are
+implicit (node i -> 2i+1 left, 2i+2 right) and a leaf is found by arithmetic, not pointer
+chasing. A leaf above depth D becomes a pass-through split (threshold +inf, missing goes
+left) over copies of itself. Per tree t:
+
+    feature[t, i], threshold[t, i], default_left[t, i]    the 2^D - 1 split nodes
+    leaf_value[t, j]                                      the 2^D leaves, left to right
+    tree_class[t]                                         output class the tree adds to
+
+Arithmetic mirrors XGBoost's CPU predictor: float32 features and thresholds, `x < threshold`
+goes left, margins start at base_score and add leaf values in tree order, and the softmax uses
+the same expf and float32/double mix, so probabilities are bit-identical.
+"""
+import json
+from decimal import Decimal, localcontext
+
+import numpy as np
+
+# Few rows: every tree advances together, one level per step, over (rows x trees) blocks of
+# this many rows (small enough to stay in cache). From BY_TREE_MIN_ROWS rows on, trees are
+# walked one at a time over the whole batch instead, which pays a fixed per-tree overhead
+# but streams long contiguous row arrays.
+LEVEL_BLOCK_ROWS = 64
+BY_TREE_MIN_ROWS = 1536
+# Padding makes each tree 2^depth leaves wide; deeper models are rejected at export
+MAX_DEPTH = 12
+
+# XGBoost's softmax calls libm `expf`. NumPy's float32 exp rounds differently in the last bit
+# for a few inputs, so this is glibc's expf algorithm (table of 2^(i/32) + cubic polynomial,
+# evaluated in double), vectorized.
+_EXP2F_N = 32
+
+
+def _exp2f_table():
+    # tab[i] = bits(2^(i/N)) - (i << 52) / N, with 2^(i/N) correctly rounded to double
+    with localcontext() as context:
+        context.prec = 40
+        powers = [float(Decimal(2) ** (Decimal(i) / _EXP2F_N)) for i in range(_EXP2F_N)]
+    return np.array(powers, dtype=np.float64).view(np.uint64) - \
+        (np.arange(_EXP2F_N, dtype=np.uint64) << np.uint64(52)) // np.uint64(_EXP2F_N)
+
+
+_EXP2F_TABLE = _exp2f_table()
+_EXPF_INVLN2 = float.fromhex("0x1.71547652b82fep+0") * _EXP2F_N
+_EXPF_POLY = (float.fromhex("0x1.c6af84b912394p-5") / _EXP2F_N ** 3,
+              float.fromhex("0x1.ebfce50fac4f3p-3") / _EXP2F_N ** 2,
+              float.fromhex("0x1.62e42ff0c52d6p-1") / _EXP2F_N)
+
+
+def expf(x: np.ndarray) -> np.ndarray:
+    """exp() of float32 inputs, bit-identical to glibc `expf` (finite inputs in float range)."""
+    z = _EXPF_INVLN2 * np.asarray(x, dtype=np.float64)
+    k = np.rint(z)
+    r = z - k
+    k = k.astype(np.int64)
+    scale = (_EXP2F_TABLE[k & (_EXP2F_N - 1)] + (k << 47).astype(np.uint64)).view(np.float64)
+    c0, c1, c2 = _EXPF_POLY
+    y = (c0 * r + c1) * (r * r) + (c2 * r + 1)
+    return (y * scale).astype(np.float32)
+
+
+class TreeEnsemble:
+    def __init__(self, mean, scale, feature, threshold, default_left, leaf_value, tree_class,
+                 base_score, classes):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float32)
+        self.tree_class = np.asarray(tree_class, dtype=np.int64)
+        self.base_score = np.asarray(base_score, dtype=np.float32)
+        self.classes = np.asarray(classes)
+        self.n_trees, self.n_leaves = self.leaf_value.shape
+        self.depth = self.n_leaves.bit_length() - 1
+        self.n_classes = len(self.base_score)
+        self._class_trees = [np.flatnonzero(self.tree_class == k) for k in range(self.n_classes)]
+
+    # --- Export -----------------------------------------------------------
+
+    @classmethod
+    def from_pipeline(cls, pipeline, classes) -> "TreeEnsemble":
+        """Flattens a fitted Pipeline([StandardScaler, XGBClassifier]) (gbtree, numeric splits)."""
+        scaler, classifier = pipeline.steps[0][1], pipeline.steps[-1][1]
+        booster = classifier.get_booster()
+        config = json.loads(booster.save_config())["learner"]
+        if config["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster: {config['gradient_booster']['name']}")
+        objective = config["objective"]["name"]
+        if objective != "multi:softprob":
+            raise ValueError(f"Unsupported objective: {objective}")
+
+        model = json.loads(booster.save_raw("json"))["learner"]
+        n_classes = int(model["learner_model_param"]["num_class"])
+        base_score = np.array(json.loads(model["learner_model_param"]["base_score"]), dtype=np.float32).ravel()
+        if base_score.size == 1:
+            base_score = np.repeat(base_score, n_classes)
+        trees = model["gradient_booster"]["model"]["trees"]
+        if any(any(tree["split_type"]) for tree in trees):
+            raise ValueError("Categorical splits are not supported.")
+
+        depth = max(cls._tree_depth(tree["left_children"], tree["right_children"]) for tree in trees)
+        if depth > MAX_DEPTH:
+            raise ValueError(f"Tree depth {depth} exceeds MAX_DEPTH={MAX_DEPTH}.")
+        splits, leaves = 2 ** depth - 1, 2 ** depth
+        feature = np.zeros((len(trees), splits), dtype=np.int64)
+        threshold = np.full((len(trees), splits), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), splits), dtype=bool)
+        leaf_value = np.zeros((len(trees), leaves), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            lefts, rights = tree["left_children"], tree["right_children"]
+            # (xgboost node, position in the padded tree, level)
+            stack = [(0, 0, 0)]
+            while stack:
+                node, position, level = stack.pop()
+                if level == depth:
+                    # For leaves XGBoost stores the leaf output in split_conditions
+                    leaf_value[t, position - splits] = tree["split_conditions"][node]
+                    continue
+                if lefts[node] == -1:
+                    # Leaf above the bottom: pass-through split (defaults) over two copies of it
+                    stack += [(node, 2 * position + 1, level + 1), (node, 2 * position + 2, level + 1)]
+                    continue
+                feature[t, position] = tree["split_indices"][node]
+                threshold[t, position] = tree["split_conditions"][node]
+                default_left[t, position] = bool(tree["default_left"][node])
+                stack += [(lefts[node], 2 * position + 1, level + 1), (rights[node], 2 * position + 2, level + 1)]
+
+        return cls(mean=scaler.mean_, scale=scaler.scale_, feature=feature, threshold=threshold,
+                   default_left=default_left, leaf_value=leaf_value,
+                   tree_class=model["gradient_booster"]["model"]["tree_info"],
+                   base_score=base_score, classes=classes)
+
+    @staticmethod
+    def _tree_depth(lefts, rights) -> int:
+        depth, level = 0, [0]
+        while True:
+            level = [child for node in level for child in (lefts[node], rights[node]) if child != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def save(self, path: str):
+        np.savez(path, mean=self.mean, scale=self.scale, feature=self.feature, threshold=self.threshold,
+                 default_left=self.default_left, leaf_value=self.leaf_value, tree_class=self.tree_class,
+                 base_score=self.base_score, classes=self.classes.astype(str))
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemble":
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    # --- Inference --------------------------------------------------------
+
+    def predict_proba(self, features) -> np.ndarray:
+        """(rows x classes) float32 probabilities for raw (unscaled) features in training column order."""
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features[None, :]
+        # Same operations as StandardScaler.transform, then XGBoost's float32 input
+        scaled = ((features - self.mean) / self.scale).astype(np.float32)
+        if len(scaled) >= BY_TREE_MIN_ROWS:
+            margins = self._margins_by_tree(scaled)
+        else:
+            margins = np.empty((len(scaled), self.n_classes), dtype=np.float32)
+            for start in range(0, len(scaled), LEVEL_BLOCK_ROWS):
+                margins[start:start + LEVEL_BLOCK_ROWS] = self._margins_by_level(scaled[start:start + LEVEL_BLOCK_ROWS])
+        return self._softmax(margins)
+
+    def predict(self, features):
+        """Class labels (arg-max of the probabilities)."""
+        return self.classes[self.predict_proba(features).argmax(axis=1)]
+
+    def _margins_by_level(self, block: np.ndarray) -> np.ndarray:
+        """All trees at once: a (rows x trees) array of positions descends one level per step."""
+        has_missing = np.isnan(block).any()
+        splits = self.feature.shape[1]
+        offsets = np.arange(self.n_trees) * splits
+        feature, threshold, default_left = self.feature.ravel(), self.threshold.ravel(), self.default_left.ravel()
+        position = np.zeros((len(block), self.n_trees), dtype=np.int64)
+        for _ in range(self.depth):
+            node = offsets + position
+            values = np.take_along_axis(block, feature[node], axis=1)
+            right = values >= threshold[node]
+            if has_missing:
+                right |= np.isnan(values) & ~default_left[node]
+            position = 2 * position + 1 + right
+
+        leaves = self.leaf_value.ravel()[np.arange(self.n_trees) * self.n_leaves + position - splits]
+        margins = np.empty((len(block), self.n_classes), dtype=np.float32)
+        for k, trees in enumerate(self._class_trees):
+            # Sequential float32 accumulation from base_score, in tree order, like XGBoost
+            column = np.concatenate([np.full((len(block), 1), self.base_score[k], dtype=np.float32),
+                                     leaves[:, trees]], axis=1)
+            margins[:, k] = np.cumsum(column, axis=1, dtype=np.float32)[:, -1]
+        return margins
+
+    def _margins_by_tree(self, scaled: np.ndarray) -> np.ndarray:
+        """One tree at a time over the whole batch; features are read column-major."""
+        rows = len(scaled)
+        has_missing = np.isnan(scaled).any()
+        columns = np.ascontiguousarray(scaled.T)
+        flat_columns, row_index = columns.ravel(), np.arange(rows)
+        splits = self.feature.shape[1]
+        margins = np.tile(self.base_score, (rows, 1))
+        for t in range(self.n_trees):
+            feature, threshold, default_left = self.feature[t], self.threshold[t], self.default_left[t]
+            # The root is the same node for every row: a plain column compare, no gather
+            values = columns[feature[0]]
+            right = values >= threshold[0]
+            if has_missing:
+                right |= np.isnan(values) & ~default_left[0]
+            position = 1 + right.astype(np.int64)
+            for _ in range(self.depth - 1):
+                values = flat_columns[feature[position] * rows + row_index]
+                right = values >= threshold[position]
+                if has_missing:
+                    right |= np.isnan(values) & ~default_left[position]
+                position = 2 * position + 1 + right
+            margins[:, self.tree_class[t]] += self.leaf_value[t][position - splits]
+        return margins
+
+    @staticmethod
+    def _softmax(margins: np.ndarray) -> np.ndarray:
+        # float32 exponentials, summed in double class by class, then one float32 division
+        exps = expf(margins - margins.max(axis=1, keepdims=True))
+        total = np.zeros(len(exps), dtype=np.float64)
+        for k in range(exps.shape[1]):
+            total += exps[:, k]
+        return exps / total.astype(np.float32)[:, None]
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Date
+from app.db.base_class import Base
+
+class DailyCensus(Base):
+    """
+    Rollup of `patients`: admissions per (admission day, zone).
+    Maintained incrementally by every patient write path (see app/services/census_rollup.py)
+    and rebuildable from scratch with scripts/rebuild_census.py.
+    """
+    __tablename__ = "daily_census"
+
+    day = Column(Date, primary_key=True)
+    zone = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,9 +1,17 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Index
 from datetime import datetime
 from app.db.base_class import Base  # <--- MUST MATCH User model's import
 
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (
+        # Keyset pagination: one (sort_key, id) index per supported sort order.
+        # The first also serves every admission_date range filter (leading column).
+        Index("ix_patients_admission_date_id", "admission_date", "id"),
+        Index("ix_patients_risk_score_id", "risk_score", "id"),
+        # Covers the single-pass KPI snapshot (GROUP BY zone, risk_level + census filter) and zone filters
+        Index("ix_patients_zone_risk_level_admission", "zone", "risk_level", "admission_date"),
+    )
 
     id = Column(String, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -22,7 +30,7 @@ class Patient(Base):
     
     # Risk Analysis
     risk_score = Column(Float, default=0.0)
-    risk_level = Column(String, default="Low")
+    risk_level = Column(String, default="Low", index=True)
     
     # Operational
     zone = Column(String, default="General Ward")
@@ -0,0 +1,349 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.patient import Patient
+from app.services.census_rollup import UNASSIGNED_ZONE
+from app.services.kpi_engine import normalize_risk_level
+from app.services.patient_events import add_listener
+
+CATEGORY_DIMENSIONS = ("zone", "risk_level", "condition")
+DIMENSIONS = CATEGORY_DIMENSIONS + ("day",)
+VITALS = ("sys_bp", "dia_bp", "heart_rate", "spo2", "temp", "bmi")
+UNKNOWN_LABEL = "Unknown"
+LABEL_DEFAULTS = {"zone": UNASSIGNED_ZONE, "risk_level": UNKNOWN_LABEL, "condition": UNKNOWN_LABEL}
+
+_EPOCH = date(1970, 1, 1)
+# `add` switches from per-cell np.add.at to whole-cube np.bincount once the cells to fold in
+# reach 1/DENSE_ADD_RATIO of the cube (bincount costs O(cube size) per measure, add.at O(cells))
+DENSE_ADD_RATIO = 8
+
+
+def _epoch_day(day) -> int:
+    return (pd.Timestamp(day).date() - _EPOCH).days
+
+
+def rows_to_cells(records) -> pd.DataFrame:
+    """
+    Patient rows (list of dicts or DataFrame) in the shape `build_query` returns: one cell per
+    row with count 1, the vital as its own sum and 1/0 for whether it was recorded.
+    """
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame(list(records))
+    cells = pd.DataFrame({name: frame[name] if name in frame else None for name in CATEGORY_DIMENSIONS},
+                         index=frame.index)
+    cells["day"] = frame["admission_date"] if "admission_date" in frame else None
+    cells["count"] = 1
+    for name in VITALS:
+        values = pd.to_numeric(frame[name], errors="coerce") if name in frame else pd.Series(float("nan"), index=frame.index)
+        cells[f"sum_{name}"] = values.fillna(0.0)
+        cells[f"n_{name}"] = values.notna().astype(np.int64)
+    return cells
+
+
+def build_query():
+    """
+    Pre-aggregates in the database, so a million patients arrive as ~days x zones x levels x
+    conditions rows instead of a million; `date()` exists on both SQLite and PostgreSQL.
+    """
+    day = func.date(Patient.admission_date)
+    dimensions = [getattr(Patient, name) for name in CATEGORY_DIMENSIONS]
+    return (select(*dimensions, day, func.count(),
+                   *[func.sum(getattr(Patient, name)) for name in VITALS],
+                   *[func.count(getattr(Patient, name)) for name in VITALS])
+            .where(Patient.admission_date.isnot(None))
+            .group_by(*dimensions, day))
+
+
+MEASURE_COLUMNS = ["count"] + [f"sum_{name}" for name in VITALS] + [f"n_{name}" for name in VITALS]
+BUILD_COLUMNS = list(CATEGORY_DIMENSIONS) + ["day"] + MEASURE_COLUMNS
+
+
+def _labels(frame: pd.DataFrame, column: str) -> pd.Series:
+    default = LABEL_DEFAULTS[column]
+    if column not in frame:
+        return pd.Series([default] * len(frame), index=frame.index)
+    values = frame[column].astype(object)
+    values = values.where(values.notna(), default).astype(str)
+    if column == "risk_level":
+        # Normalized per distinct value, not per row
+        values = values.map({v: normalize_risk_level(v) or default for v in values.unique()})
+    return values
+
+
+class _Axis:
+    """Label <-> position mapping for one categorical dimension; positions never move."""
+    def __init__(self):
+        self.labels = []
+        self.positions = {}
+
+    def encode(self, values: pd.Series):
+        """(positions of `values`, number of labels appended to the axis)."""
+        codes, uniques = pd.factorize(values)
+        before = len(self.labels)
+        lookup = np.empty(len(uniques), dtype=np.int64)
+        for i, label in enumerate(uniques):
+            if label not in self.positions:
+                self.positions[label] = len(self.labels)
+                self.labels.append(label)
+            lookup[i] = self.positions[label]
+        return lookup[codes], len(self.labels) - before
+
+
+class _Cube:
+    """
+    Dense arrays over (zone, risk_level, condition, day): `counts[z, r, c, d]`, and per vital
+    `sums[v, z, r, c, d]` plus `present[v, ...]` (non-null readings) so means stay exact when
+    a vital is missing. Axes grow in place as new labels or days show up.
+    """
+    def __init__(self, max_days: int = settings.DASHBOARD_CUBE_MAX_DAYS):
+        self.axes = {name: _Axis() for name in CATEGORY_DIMENSIONS}
+        self.max_days = max_days
+        self.day_origin = None  # epoch day at day position 0
+        self.out_of_range = 0  # patients left out for an admission day outside the window
+        self.counts = np.zeros((0, 0, 0, 0), dtype=np.int64)
+        self.sums = np.zeros((len(VITALS), 0, 0, 0, 0), dtype=np.float64)
+        self.present = np.zeros((len(VITALS), 0, 0, 0, 0), dtype=np.int64)
+
+    def add(self, frame: pd.DataFrame):
+        """
+        Folds cells (BUILD_COLUMNS: dimensions, day, count, sum_<vital>, n_<vital>) into the
+        arrays. Duplicate coordinates just add up. A large frame (the initial build) takes one
+        weighted `np.bincount` per measure over the whole cube; a few cells (incremental
+        inserts) are added in place with `np.add.at` on their flat indices only.
+        Days outside the last `max_days` (up to tomorrow) are skipped and counted in `out_of_range`.
+        """
+        admitted = pd.to_datetime(frame["day"], errors="coerce")
+        frame, admitted = frame[admitted.notna()], admitted[admitted.notna()]
+        if frame.empty:
+            return
+        days = admitted.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+        last_day = (date.today() - _EPOCH).days + 1
+        in_range = (days > last_day - self.max_days) & (days <= last_day)
+        if not in_range.all():
+            self.out_of_range += int(np.nan_to_num(frame["count"].to_numpy(dtype=np.float64))[~in_range].sum())
+            frame, days = frame[in_range], days[in_range]
+            if frame.empty:
+                return
+
+        positions = []
+        for axis_number, name in enumerate(CATEGORY_DIMENSIONS):
+            encoded, added = self.axes[name].encode(_labels(frame, name))
+            if added:
+                self._grow(axis_number, 0, added)
+            positions.append(encoded)
+        self._cover_days(int(days.min()), int(days.max()))
+        positions.append(days - self.day_origin)
+
+        shape, size = self.counts.shape, self.counts.size
+        flat = np.ravel_multi_index(positions, shape)
+        dense = len(flat) * DENSE_ADD_RATIO >= size
+        # One conversion for every measure (SQL sums may arrive as Decimal, NULL as None)
+        measures = np.nan_to_num(frame[MEASURE_COLUMNS].to_numpy(dtype=np.float64))
+        targets = [self.counts] + [self.sums[v] for v in range(len(VITALS))] + \
+                  [self.present[v] for v in range(len(VITALS))]
+        for target, weights in zip(targets, measures.T):
+            if dense:
+                target += np.bincount(flat, weights=weights, minlength=size).reshape(shape).astype(target.dtype)
+            else:
+                # Arrays are C-contiguous (np.zeros / np.pad), so reshape(-1) is a view to add into
+                np.add.at(target.reshape(-1), flat, weights.astype(target.dtype))
+
+    def _cover_days(self, low: int, high: int):
+        if self.day_origin is None:
+            self.day_origin = low
+            self._grow(3, 0, high - low + 1)
+            return
+        if low < self.day_origin:
+            self._grow(3, self.day_origin - low, 0)
+            self.day_origin = low
+        end = self.day_origin + self.counts.shape[3]
+        if high >= end:
+            self._grow(3, 0, high - end + 1)
+
+    def _grow(self, axis: int, before: int, after: int):
+        pad = [(0, 0)] * 4
+        pad[axis] = (before, after)
+        self.counts = np.pad(self.counts, pad)
+        self.sums = np.pad(self.sums, [(0, 0)] + pad)
+        self.present = np.pad(self.present, [(0, 0)] + pad)
+
+    def day_label(self, position: int) -> str:
+        return (_EPOCH + timedelta(days=int(self.day_origin + position))).isoformat()
+
+
+class AnalyticsCube:
+    """
+    In-memory zone x risk_level x condition x admission-day cube of patient counts and vital
+    sums, so drill-down views are array slices instead of SQL.
+
+    Built with `np.bincount` over `patients` in batches, then kept current from patient_events:
+    inserts that carry their rows are folded in incrementally; changes without rows (upserts)
+    mark the cube stale. A stale cube, or one older than DASHBOARD_CUBE_REFRESH_SECONDS (writes
+    from other processes), is rebuilt in the background while the current one keeps serving.
+    """
+    def __init__(self, refresh_seconds: float = settings.DASHBOARD_CUBE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._cube = None
+        self._built_at = None
+        self._stale = False
+        self._changed_during_build = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = threading.Event()
+        add_listener(self._on_patients_changed)
+
+    # --- Build / update ---------------------------------------------------
+
+    def ensure_built(self):
+        if self._cube is None:
+            with self._build_lock:
+                if self._cube is None:
+                    self._rebuild()
+        elif self._stale or time.monotonic() - self._built_at > self.refresh_seconds:
+            self.rebuild_in_background()
+
+    def rebuild_in_background(self):
+        if self._rebuilding.is_set():
+            return
+        self._rebuilding.set()
+
+        def run():
+            try:
+                with self._build_lock:
+                    self._rebuild()
+            except Exception as e:
+                print(f"⚠️ Analytics cube rebuild failed: {e}")
+            finally:
+                self._rebuilding.clear()
+
+        threading.Thread(target=run, name="analytics-cube-rebuild", daemon=True).start()
+
+    def _rebuild(self):
+        """Full scan into a new cube, swapped in when complete. Caller holds `_build_lock`."""
+        start = time.perf_counter()
+        # A write committed mid-scan may or may not be in it; such writes leave the new cube stale
+        self._changed_during_build = False
+        cube = _Cube()
+        with SessionLocal() as db:
+            cube.add(pd.DataFrame(db.execute(build_query()).all(), columns=BUILD_COLUMNS))
+        rows = int(cube.counts.sum())
+        with self._lock:
+            self._cube = cube
+            self._built_at = time.monotonic()
+            self._stale = self._changed_during_build
+        print(f"🧊 Analytics cube built: {rows} patients into {cube.counts.size} cells "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def _on_patients_changed(self, rows, records=None):
+        if self._build_lock.locked():
+            self._changed_during_build = True
+        with self._lock:
+            if self._cube is None:
+                return
+            if records is None:
+                self._stale = True
+                return
+            try:
+                self._cube.add(rows_to_cells(records))
+            except Exception as e:
+                print(f"⚠️ Analytics cube update failed, scheduling rebuild: {e}")
+                self._stale = True
+
+    # --- Query ------------------------------------------------------------
+
+    def query(self, group_by=(), filters: dict = None, start: date = None, end: date = None,
+              vitals=VITALS) -> dict:
+        """
+        Slices by `filters` ({dimension: [labels]}) and the half-open day range [start, end),
+        then rolls up every dimension not in `group_by`. Returns one cell per non-empty group
+        (`count` and `avg_<vital>`) plus the totals of the whole slice.
+        """
+        self.ensure_built()
+        filters = filters or {}
+        vital_rows = [VITALS.index(name) for name in vitals]
+        with self._lock:
+            cube = self._cube
+            span = cube.counts.shape[3]
+            first, last = 0, span
+            if cube.day_origin is not None:
+                if start is not None:
+                    first = min(max(_epoch_day(start) - cube.day_origin, 0), span)
+                if end is not None:
+                    last = min(max(_epoch_day(end) - cube.day_origin, first), span)
+            # Day range is a view; filtered dimensions are gathered one axis at a time (np.take),
+            # which is far cheaper than one multi-axis fancy index over the 5-d vital arrays
+            counts = cube.counts[..., first:last]
+            sums = cube.sums[..., first:last]
+            present = cube.present[..., first:last]
+            if vital_rows != list(range(len(VITALS))):
+                sums, present = np.take(sums, vital_rows, axis=0), np.take(present, vital_rows, axis=0)
+            labels = []
+            for axis_number, name in enumerate(CATEGORY_DIMENSIONS):
+                axis = cube.axes[name]
+                if filters.get(name):
+                    positions = [axis.positions[l] for l in filters[name] if l in axis.positions]
+                    counts = np.take(counts, positions, axis=axis_number)
+                    sums = np.take(sums, positions, axis=axis_number + 1)
+                    present = np.take(present, positions, axis=axis_number + 1)
+                    labels.append([axis.labels[i] for i in positions])
+                else:
+                    labels.append(list(axis.labels))
+            labels.append([cube.day_label(i) for i in range(first, last)] if "day" in group_by else [])
+
+            # Reduced under the lock: unfiltered slices are views that incremental updates add into
+            grouped = [DIMENSIONS.index(name) for name in group_by]
+            rolled = tuple(axis for axis in range(4) if axis not in grouped)
+            # Summing keeps the grouped axes in dimension order; reorder them to follow `group_by`
+            order = list(np.argsort(np.argsort(grouped)))
+            counts = counts.sum(axis=rolled).transpose(order)
+            sums = sums.sum(axis=tuple(a + 1 for a in rolled)).transpose([0] + [a + 1 for a in order])
+            present = present.sum(axis=tuple(a + 1 for a in rolled)).transpose([0] + [a + 1 for a in order])
+
+        cells = []
+        if grouped:
+            # Column-wise: labels and measures for every non-empty group at once, then zipped into rows
+            found = np.nonzero(counts)
+            columns = [np.asarray(labels[DIMENSIONS.index(name)], dtype=object)[positions].tolist()
+                       for name, positions in zip(group_by, found)]
+            columns += self._measure_columns(counts[found], sums[(slice(None),) + found],
+                                             present[(slice(None),) + found])
+            keys = list(group_by) + ["count"] + [f"avg_{name}" for name in vitals]
+            cells = [dict(zip(keys, row)) for row in zip(*columns)]
+        totals = self._measure_columns(np.atleast_1d(counts.sum()),
+                                       sums.reshape(len(vitals), -1).sum(axis=1, keepdims=True),
+                                       present.reshape(len(vitals), -1).sum(axis=1, keepdims=True))
+        keys = ["count"] + [f"avg_{name}" for name in vitals]
+        return {"groupBy": list(group_by), "cells": cells, "totals": dict(zip(keys, [c[0] for c in totals]))}
+
+    def stats(self) -> dict:
+        self.ensure_built()
+        with self._lock:
+            cube = self._cube
+            days = None
+            if cube.day_origin is not None:
+                days = [cube.day_label(0), cube.day_label(cube.counts.shape[3] - 1)]
+            return {
+                "dimensions": {**{name: list(cube.axes[name].labels) for name in CATEGORY_DIMENSIONS}, "day": days},
+                "cells": int(cube.counts.size),
+                "patients": int(cube.counts.sum()),
+                "bytes": int(cube.counts.nbytes + cube.sums.nbytes + cube.present.nbytes),
+                "ageSeconds": round(time.monotonic() - self._built_at, 1),
+                "stale": self._stale,
+                "outOfRangePatients": cube.out_of_range,
+            }
+
+    @staticmethod
+    def _measure_columns(counts, sums, present) -> list:
+        """[counts, avg per vital...] as plain lists; the mean is None where a vital was never recorded."""
+        means = np.round(np.divide(sums, present, out=np.zeros_like(sums), where=present > 0), 2).astype(object)
+        means[present == 0] = None
+        return [counts.astype(np.int64).tolist()] + means.tolist()
+
+
+analytics_cube = AnalyticsCube()
@@ -3,8 +3,10 @@ import numpy as np
 import joblib
 import os
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from datetime import datetime, timedelta
+from app.core.cache import dashboard_cache
+from app.services.census_rollup import census_rollup
+from app.services.kpi_engine import kpi_engine
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 MODEL_PATH = os.path.join(BASE_DIR, "app", "ml", "models", "risk_model.pkl")
@@ -26,56 +28,33 @@ class AnalyticsEngine:
 
     def get_kpi_metrics(self, db: Session):
         try:
-            # Anchor to latest DB date
-            max_date = db.execute(text("SELECT MAX(admission_date) FROM patients")).scalar()
-            if not max_date:
-                return {"activePatients": 0, "avgLos": 0, "readmissionRate": 0, "virtualBedUtilization": 0}
-
-            census_query = text(f"SELECT COUNT(*) FROM patients WHERE admission_date >= '{max_date}'::date - INTERVAL '14 days'")
-            census = db.execute(census_query).scalar() or 0
-            
-            # KPI Calculations
-            utilization = round(float(census / 5000) * 100, 1)
-
-            return {
-                "activePatients": int(census),
-                "avgLos": 4.2,        
-                "readmissionRate": 12.4, 
-                "virtualBedUtilization": utilization
-            }
+            # View of the single-pass KPI snapshot (shared with get_population_risk)
+            return kpi_engine.kpis(db)
         except Exception as e:
             print(f"KPI Error: {e}")
             return {"activePatients": 0, "avgLos": 0, "readmissionRate": 0, "virtualBedUtilization": 0}
 
+    @dashboard_cache.memoize("census_trend")
     def generate_census_forecast(self, db: Session):
         """
         Generates a continuous, gap-free forecast chart.
         """
         try:
-            # 1. Get Anchor Date
-            max_date_row = db.execute(text("SELECT MAX(admission_date) FROM patients")).scalar()
-            if not max_date_row: return [] # Handle empty DB
+            # 1. Get Anchor Date (latest admission day in the census rollup)
+            anchor_day = census_rollup.latest_day(db)
+            if not anchor_day: return [] # Handle empty DB
+
+            end_date = datetime.combine(anchor_day, datetime.min.time())
+            current_date = end_date - timedelta(days=29)
 
-            anchor_date = str(max_date_row)
-            
             # 2. Get Raw History (Last 30 Days)
-            query = text(f"""
-                SELECT date(admission_date) as day, COUNT(*) as count 
-                FROM patients 
-                WHERE admission_date > '{anchor_date}'::date - INTERVAL '30 days'
-                AND admission_date <= '{anchor_date}'::date
-                GROUP BY day 
-                ORDER BY day ASC
-            """)
-            raw_results = db.execute(query).fetchall()
-            
+            raw_results = census_rollup.daily_totals(db, start=current_date.date(), end=anchor_day + timedelta(days=1))
+
             # 3. Fill Missing Dates (Crucial for smooth charts)
             # Create a dictionary of {date_str: count}
-            history_map = {str(row[0]): int(row[1]) for row in raw_results}
-            
+            history_map = {str(day): count for day, count in raw_results}
+
             final_data = []
-            current_date = datetime.strptime(anchor_date, "%Y-%m-%d") - timedelta(days=29)
-            end_date = datetime.strptime(anchor_date, "%Y-%m-%d")
             
             # Iterate through every single day last 30 days
             while current_date <= end_date:
@@ -127,24 +106,10 @@ class AnalyticsEngine:
 
     def get_population_risk(self, db: Session):
         try:
-            query = text("SELECT risk_level, COUNT(*) FROM patients GROUP BY risk_level")
-            results = db.execute(query).fetchall()
-            
-            stats = {"Low": 0, "Medium": 0, "High": 0, "Critical": 0}
-            for row in results:
-                if row[0]:
-                    level = row[0].capitalize()
-                    if level == 'Moderate': level = 'Medium'
-                    if level in stats: stats[level] += int(row[1])
-            
-            return [
-                {"name": "Low", "value": stats["Low"]},
-                {"name": "Medium", "value": stats["Medium"]},
-                {"name": "High", "value": stats["High"]},
-                {"name": "Critical", "value": stats["Critical"]}
-            ]
+            return kpi_engine.risk_distribution(db)
         except Exception: return []
 
+    @dashboard_cache.memoize("feature_importance", uses_db=False)
     def get_feature_importance(self):
         if not self.model: return []
         try:
@@ -161,6 +126,7 @@ class AnalyticsEngine:
             return []
         except Exception: return []
 
+    @dashboard_cache.memoize("readmission_trend", uses_db=False)
     def get_readmission_trend(self):
         return [{"month": m, "rate": r} for m, r in zip(["Jul","Aug","Sep","Oct","Nov","Dec"], [14.2, 13.8, 13.5, 12.9, 12.4, 11.8])]
 
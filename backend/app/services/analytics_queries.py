@@ -0,0 +1,39 @@
+"""
+SQLAlchemy Core query layer for dashboard analytics.
+
+Every query is portable (SQLite + PostgreSQL), uses bound parameters, and filters timestamps with
+half-open ranges (`start <= admission_date < end`) on the bare column so an index can serve it.
+Wrapping the column (`date(admission_date) < CURRENT_DATE`) would force a scan of every row.
+"""
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, select
+
+from app.models.patient import Patient
+
+
+def day_start(day) -> datetime:
+    """Midnight at the start of `day` (accepts date or datetime)."""
+    if isinstance(day, datetime):
+        day = day.date()
+    return datetime.combine(day, time.min)
+
+
+def admitted_between(start: datetime = None, end: datetime = None):
+    """WHERE clauses for start <= admission_date < end (either bound optional)."""
+    clauses = []
+    if start is not None:
+        clauses.append(Patient.admission_date >= start)
+    if end is not None:
+        clauses.append(Patient.admission_date < end)
+    return clauses
+
+
+def latest_admission():
+    # MAX on an indexed column: a single index probe on both dialects
+    return select(func.max(Patient.admission_date))
+
+
+def trailing_window(anchor, days: int):
+    """[midnight `days` days before the anchor's day, midnight after it)."""
+    start = day_start(anchor) - timedelta(days=days)
+    return start, day_start(anchor) + timedelta(days=1)
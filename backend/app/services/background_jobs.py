@@ -0,0 +1,96 @@
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+MAX_RETAINED_JOBS = 200
+
+
+class Job:
+    """
+    A unit of background work plus the progress it has reported so far.
+    Targets receive the job as their first argument and call `job.update(...)` as they go.
+    """
+    def __init__(self, kind: str, meta: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.meta = meta
+        self.status = "queued"
+        self.progress = {}
+        self.errors = []
+        self.result = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                **self.meta,
+                "progress": dict(self.progress),
+                "errors": list(self.errors),
+                "result": self.result,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+class JobRunner:
+    """
+    In-process background job runner. Work runs on a small dedicated thread pool so
+    long loads never occupy the request threadpool or the event loop.
+    """
+    def __init__(self, max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, target, *args, **meta) -> Job:
+        job = Job(kind, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, target, args)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind: str = None):
+        with self._lock:
+            return [job for job in reversed(self._jobs.values()) if kind is None or job.kind == kind]
+
+    def _run(self, job: Job, target, args):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        try:
+            job.result = target(job, *args)
+            job.status = "completed_with_errors" if job.errors else "completed"
+        except Exception as e:
+            print(f"❌ Background job {job.kind}/{job.id} failed: {e}")
+            traceback.print_exc()
+            job.errors.append(str(e))
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    def _prune(self):
+        # Forget the oldest finished jobs so the registry cannot grow without bound
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self._jobs) - MAX_RETAINED_JOBS)]:
+            del self._jobs[job_id]
+
+
+job_runner = JobRunner()
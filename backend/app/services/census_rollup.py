@@ -0,0 +1,179 @@
+import pandas as pd
+from datetime import date
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.daily_census import DailyCensus
+from app.models.patient import Patient
+
+UNASSIGNED_ZONE = "Unassigned"
+ID_LOOKUP_BATCH = 5000
+
+# Raw-DBAPI form of `upsert_statement`, for loaders that write through `engine.raw_connection()`
+RAW_UPSERT_SQL = (
+    "INSERT INTO daily_census (day, zone, count) VALUES ({m}, {m}, {m}) "
+    "ON CONFLICT (day, zone) DO UPDATE SET count = daily_census.count + excluded.count"
+)
+
+
+def census_counts(admission_dates, zones, sign: int = 1) -> pd.DataFrame:
+    """Admissions per (day, zone) for a batch of patients, as a (day, zone, count) frame."""
+    # Positional: callers pass lists, Series or frame columns with arbitrary indexes
+    days = pd.to_datetime(pd.Series(list(admission_dates), dtype=object), errors="coerce")
+    zones = pd.Series(list(zones), dtype=object)
+    frame = pd.DataFrame({
+        "day": days.dt.date,
+        "zone": zones.where(zones.notna(), UNASSIGNED_ZONE).astype(str),
+    }).dropna(subset=["day"])
+    counts = frame.groupby(["day", "zone"], sort=True).size().rename("count").reset_index()
+    counts["count"] *= sign
+    return counts
+
+
+class CensusRollup:
+    """
+    Keeps `daily_census` in step with `patients`. Writers pass the rows they inserted (and, for
+    upserts, the rows they overwrote) and the per-(day, zone) deltas are added in the writer's
+    own transaction, so the rollup commits or rolls back together with the patients.
+    Readers then pay O(days x zones) instead of a GROUP BY over every patient.
+    """
+
+    # --- Write side -------------------------------------------------------
+
+    def record_added(self, db: Session, admission_dates, zones, replaced: pd.DataFrame = None):
+        """
+        For upserts, pass `replaced` from `replaced_counts` (taken before the write): rows that
+        already existed are counted out with their stored day/zone and counted back in with the
+        new ones, so re-loading a file is a no-op. Call it as the transaction's last statement,
+        so the hot rollup rows stay locked only until the commit.
+        """
+        counts = census_counts(admission_dates, zones)
+        if replaced is not None and not replaced.empty:
+            counts = pd.concat([counts, replaced])
+        self._apply(db, counts)
+
+    def replaced_counts(self, db: Session, ids) -> pd.DataFrame:
+        """Negative (day, zone) counts of the stored rows among `ids`; call before the upsert."""
+        old = self._stored_day_zone(db, list(ids))
+        return census_counts(old["admission_date"], old["zone"], sign=-1)
+
+    def record_added_raw(self, raw_conn, paramstyle: str, admission_dates, zones, replaced: pd.DataFrame = None):
+        """
+        Same as `record_added` for DBAPI connections (COPY / executemany loaders). For upserts,
+        pass `replaced` from `replaced_counts_raw` (taken before the write) to count the
+        overwritten rows out.
+        """
+        counts = census_counts(admission_dates, zones)
+        if replaced is not None and not replaced.empty:
+            counts = pd.concat([counts, replaced])
+        rows = self._delta_rows(counts)
+        if not rows:
+            return
+        marker = "?" if paramstyle == "qmark" else "%s"
+        cursor = raw_conn.cursor()
+        try:
+            cursor.executemany(RAW_UPSERT_SQL.format(m=marker),
+                               [(row["day"].isoformat(), row["zone"], row["count"]) for row in rows])
+            if any(row["count"] < 0 for row in rows):
+                cursor.execute("DELETE FROM daily_census WHERE count <= 0")
+        finally:
+            cursor.close()
+
+    def replaced_counts_raw(self, raw_conn, paramstyle: str, ids) -> pd.DataFrame:
+        """Negative (day, zone) counts of the stored rows among `ids`; call before the upsert."""
+        ids = [str(patient_id) for patient_id in ids]
+        marker = "?" if paramstyle == "qmark" else "%s"
+        rows = []
+        cursor = raw_conn.cursor()
+        try:
+            for i in range(0, len(ids), ID_LOOKUP_BATCH):
+                batch = ids[i:i + ID_LOOKUP_BATCH]
+                cursor.execute(f"SELECT admission_date, zone FROM patients WHERE id IN ({', '.join([marker] * len(batch))})",
+                               batch)
+                rows.extend(cursor.fetchall())
+        finally:
+            cursor.close()
+        old = pd.DataFrame(rows, columns=["admission_date", "zone"])
+        return census_counts(old["admission_date"], old["zone"], sign=-1)
+
+    def rebuild(self, db: Session) -> int:
+        """Recomputes the whole rollup from `patients` (one full scan). Caller commits."""
+        day = func.date(Patient.admission_date)
+        zone = func.coalesce(Patient.zone, UNASSIGNED_ZONE)
+        db.execute(delete(DailyCensus))
+        db.execute(insert(DailyCensus).from_select(
+            ["day", "zone", "count"],
+            select(day, zone, func.count()).where(Patient.admission_date.isnot(None)).group_by(day, zone)
+        ))
+        return db.query(func.count()).select_from(DailyCensus).scalar()
+
+    def ensure_populated(self, db: Session):
+        """Fills an empty rollup from existing patients (first start after the table was added)."""
+        has_rollup = db.execute(select(DailyCensus.day).limit(1)).first() is not None
+        has_patients = db.execute(select(Patient.id).limit(1)).first() is not None
+        if has_patients and not has_rollup:
+            print("📊 Building daily census rollup from existing patients...")
+            self.rebuild(db)
+            db.commit()
+
+    # --- Read side --------------------------------------------------------
+
+    def daily_totals(self, db: Session, start: date = None, end: date = None):
+        """[(day, admissions)] summed over zones for start <= day < end, oldest first."""
+        return [(day, int(count)) for day, count in db.execute(daily_totals_query(start, end)).all()]
+
+    def latest_day(self, db: Session):
+        return db.execute(latest_day_query()).scalar()
+
+    # --- Internals --------------------------------------------------------
+
+    def _apply(self, db: Session, counts: pd.DataFrame):
+        rows = self._delta_rows(counts)
+        if not rows:
+            return
+        db.execute(upsert_statement(db.get_bind().dialect.name), rows)
+        if any(row["count"] < 0 for row in rows):
+            db.execute(delete(DailyCensus).where(DailyCensus.count <= 0))
+
+    @staticmethod
+    def _delta_rows(counts: pd.DataFrame):
+        counts = counts.groupby(["day", "zone"], sort=True)["count"].sum()
+        # Sorted (day, zone) order keeps concurrent writers locking rollup rows in the same order
+        return [{"day": day, "zone": zone, "count": int(count)}
+                for (day, zone), count in counts.items() if count != 0]
+
+    @staticmethod
+    def _stored_day_zone(db: Session, ids) -> pd.DataFrame:
+        frames = []
+        for i in range(0, len(ids), ID_LOOKUP_BATCH):
+            batch = ids[i:i + ID_LOOKUP_BATCH]
+            rows = db.execute(select(Patient.admission_date, Patient.zone).where(Patient.id.in_(batch))).all()
+            frames.append(pd.DataFrame(rows, columns=["admission_date", "zone"]))
+        return pd.concat(frames) if frames else pd.DataFrame(columns=["admission_date", "zone"])
+
+
+def daily_totals_query(start: date = None, end: date = None):
+    query = select(DailyCensus.day, func.sum(DailyCensus.count)).group_by(DailyCensus.day).order_by(DailyCensus.day)
+    if start is not None:
+        query = query.where(DailyCensus.day >= start)
+    if end is not None:
+        query = query.where(DailyCensus.day < end)
+    return query
+
+
+def latest_day_query():
+    return select(func.max(DailyCensus.day))
+
+
+def upsert_statement(dialect_name: str):
+    """`count = count + delta` for an existing (day, zone), plain insert for a new one."""
+    table = DailyCensus.__table__
+    stmt = (postgresql.insert if dialect_name == "postgresql" else sqlite.insert)(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.zone],
+        set_={"count": table.c.count + stmt.excluded["count"]}
+    )
+
+
+census_rollup = CensusRollup()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+import time
+
+from app.core.cache import fresh_reads
+from app.services.patient_events import add_listener
+
+
+def diff_sections(previous: dict, current: dict):
+    """
+    Compact delta between two dashboard payloads, as (changes, removed). Dict sections (e.g.
+    `kpi`, `errors`) carry only the fields that changed or appeared, and the fields they lost are
+    listed in `removed` ({section: [field, ...]}) so a client merging deltas drops them too.
+    Other sections are sent whole when anything in them changed.
+    """
+    changes, removed = {}, {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if old == value:
+            continue
+        if isinstance(value, dict) and isinstance(old, dict):
+            changed = {k: v for k, v in value.items() if k not in old or old[k] != v}
+            if changed:
+                changes[key] = changed
+            gone = [k for k in old if k not in value]
+            if gone:
+                removed[key] = gone
+        else:
+            changes[key] = value
+    return changes, removed
+
+
+def format_sse(event: str, data: dict, event_id: int = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class _Subscriber:
+    __slots__ = ("loop", "queue")
+
+    def __init__(self, loop, queue):
+        self.loop = loop
+        self.queue = queue
+
+
+class DashboardBroadcaster:
+    """
+    One producer thread, many SSE subscribers. The producer wakes on patient writes (debounced)
+    or every `poll_interval` seconds, computes the dashboard payload once, and pushes the same
+    serialized delta to every subscriber queue, so N open screens cost one computation.
+    A subscriber too slow to drain its queue is resynced with a full snapshot instead of
+    silently missing deltas.
+    """
+    def __init__(self, compute, debounce: float, poll_interval: float, heartbeat: float, queue_size: int = 16):
+        self.compute = compute
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._initial_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._state = None
+        self._seq = 0
+        self.computations = 0
+        add_listener(self._on_patients_changed)
+
+    # --- Subscriber side (event loop) --------------------------------------
+
+    async def subscribe(self):
+        """Async generator of SSE frames: a full snapshot first, then deltas and heartbeats."""
+        loop = asyncio.get_running_loop()
+        subscriber = _Subscriber(loop, asyncio.Queue(maxsize=self.queue_size))
+        # Register before reading the snapshot: a delta published in between is then queued,
+        # and re-applying it is harmless because deltas carry values, not increments
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._ensure_thread()
+        try:
+            snapshot = self._state
+            if snapshot is None:
+                # First subscribers ever: compute once, off the event loop
+                snapshot = await loop.run_in_executor(None, self._initial_state)
+            yield format_sse("snapshot", snapshot, self._seq)
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    frame = ": ping\n\n"  # SSE comment keeps proxies from closing an idle stream
+                yield frame
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    # --- Producer side (background thread) ---------------------------------
+
+    def _on_patients_changed(self, rows, records=None):
+        self.wake()
+
+    def wake(self):
+        """Schedules a recompute (debounced); used for writes and model retrains."""
+        self._wake.set()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="dashboard-broadcaster", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            woken = self._wake.wait(timeout=self.poll_interval)
+            if woken:
+                # Let a burst of writes (e.g. ingestion chunks) settle into one update
+                time.sleep(self.debounce)
+            self._wake.clear()
+            if not self.subscriber_count:
+                continue
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"⚠️ Dashboard broadcast failed: {e}")
+
+    def publish(self):
+        """
+        Recomputes once and fans the delta out; returns it as (changes, removed), both empty if
+        nothing changed.
+        """
+        previous = self._state or {}
+        current = self._refresh_state()
+        changes, removed = diff_sections(previous, current)
+        if changes or removed:
+            self._seq += 1
+            delta = {"seq": self._seq, "changes": changes}
+            if removed:
+                delta["removed"] = removed
+            frame = format_sse("delta", delta, self._seq)
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                subscriber.loop.call_soon_threadsafe(self._offer, subscriber, frame)
+        return changes, removed
+
+    def _refresh_state(self):
+        with fresh_reads():
+            state = self.compute()
+        self.computations += 1
+        self._state = state
+        return state
+
+    def _initial_state(self):
+        with self._initial_lock:
+            return self._state if self._state is not None else self._refresh_state()
+
+    def _offer(self, subscriber, frame):
+        # Runs on the subscriber's event loop
+        if subscriber.queue.full():
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            frame = format_sse("snapshot", self._state, self._seq)
+        subscriber.queue.put_nowait(frame)
@@ -1,45 +1,242 @@
+import io
+import os
+import time
 import pandas as pd
+from sqlalchemy import column, insert, select, table
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from app.db.session import engine
 from app.models.patient import Patient
-import time
+from app.services.census_rollup import census_rollup
+from app.services.patient_events import notify_patients_changed
+
+CHUNK_SIZE = 50000
+
+# Column order shared by the COPY and executemany loaders
+PATIENT_COLUMNS = [column.name for column in Patient.__table__.columns]
+DATETIME_COLUMNS = ["admission_date", "created_at"]
+# Matches SQLAlchemy's SQLite DateTime storage format so the ORM can read rows back
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+LOADER_METHODS = ("auto", "copy", "executemany", "to_sql")
+
+# COPY lands here first; one INSERT ... SELECT ... ON CONFLICT then upserts it into `patients`
+COPY_STAGE_TABLE = "patients_copy_stage"
+
+
+def prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleans a raw CSV chunk and aligns it with the `patients` table columns.
+    """
+    # Basic Cleaning
+    chunk = chunk.fillna(0)
+
+    # Add timestamp
+    chunk["created_at"] = pd.Timestamp.now()
+
+    for column in DATETIME_COLUMNS:
+        if column in chunk.columns:
+            chunk[column] = pd.to_datetime(chunk[column], errors="coerce")
+
+    # Drop CSV columns the table does not know about (keeps COPY column lists valid)
+    return chunk[[c for c in PATIENT_COLUMNS if c in chunk.columns]]
+
+
+def copy_chunk(raw_conn, chunk: pd.DataFrame):
+    """
+    PostgreSQL: streams the chunk through `COPY ... FROM STDIN` (from an in-memory CSV buffer)
+    into a temp staging table, then upserts the staged rows into `patients` in one statement.
+    """
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    columns = list(chunk.columns)
+    stage = table(COPY_STAGE_TABLE, *[column(name) for name in columns])
+    upsert = patient_upsert_statement("postgresql", from_select=(columns, select(*stage.c)))
+    cursor = raw_conn.cursor()
+    try:
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {COPY_STAGE_TABLE} "
+                       f"(LIKE patients INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+        cursor.copy_expert(f"COPY {COPY_STAGE_TABLE} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(str(upsert.compile(dialect=engine.dialect)))
+    finally:
+        cursor.close()
+
+
+def executemany_chunk(raw_conn, chunk: pd.DataFrame):
+    """
+    SQLite (and any other DBAPI driver): one prepared upsert executed for every row.
+    """
+    chunk = chunk.copy()
+    for column_name in DATETIME_COLUMNS:
+        if column_name in chunk.columns:
+            chunk[column_name] = chunk[column_name].dt.strftime(SQLITE_DATETIME_FORMAT)
+
+    # object dtype turns numpy scalars into plain Python values the driver can bind
+    records = chunk.astype(object).where(chunk.notna(), None)
+
+    compiled = patient_upsert_statement(engine.dialect.name).compile(dialect=engine.dialect,
+                                                                     column_keys=list(chunk.columns))
+    if compiled.positional:
+        rows = list(records[list(compiled.positiontup)].itertuples(index=False, name=None))
+    else:
+        rows = records.to_dict("records")
+    cursor = raw_conn.cursor()
+    try:
+        cursor.executemany(str(compiled), rows)
+    finally:
+        cursor.close()
 
-def ingest_csv_to_db(file_path: str):
+
+def to_sql_upsert(pd_table, conn, keys, data_iter):
+    """pandas `to_sql(method=...)` hook: the same upsert, one multi-row execute per batch."""
+    conn.execute(patient_upsert_statement(conn.dialect.name), [dict(zip(keys, row)) for row in data_iter])
+
+
+def patient_upsert_statement(dialect_name: str, from_select=None):
+    """
+    INSERT that overwrites an existing patient with the same id, so reloading rows is idempotent.
+    PostgreSQL and SQLite both get `ON CONFLICT (id) DO UPDATE`; on SQLite this is preferred over
+    `INSERT OR REPLACE`, which deletes and re-inserts the row (losing created_at).
+    `from_select=(columns, select)` turns it into INSERT ... SELECT (e.g. from a staging table).
+    """
+    table = Patient.__table__
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(table)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        stmt = insert(table)
+    if from_select is not None:
+        stmt = stmt.from_select(*from_select)
+    if dialect_name not in ("postgresql", "sqlite"):
+        return stmt
+
+    updated = {c.name: stmt.excluded[c.name] for c in table.columns if c.name not in ("id", "created_at")}
+    return stmt.on_conflict_do_update(index_elements=[table.c.id], set_=updated)
+
+
+def resolve_method(method: str = "auto") -> str:
+    if method not in LOADER_METHODS:
+        raise ValueError(f"Unknown loader method '{method}'. Use one of: {', '.join(LOADER_METHODS)}")
+    if method == "auto":
+        return "copy" if engine.dialect.name == "postgresql" else "executemany"
+    if method == "copy" and engine.dialect.name != "postgresql":
+        raise ValueError("COPY loading is only available on PostgreSQL.")
+    return method
+
+
+def ingest_csv_to_db(file_path: str, method: str = "auto", chunk_size: int = CHUNK_SIZE,
+                     progress_callback=None, skip_bad_chunks: bool = False):
     """
-    Reads a large CSV in chunks and bulk inserts into PostgreSQL.
+    Reads a large CSV in chunks and bulk loads it into the `patients` table.
+
+    method:
+        auto        -> `copy` on PostgreSQL, `executemany` everywhere else
+        copy        -> PostgreSQL COPY FROM STDIN (fastest)
+        executemany -> single prepared INSERT, driver-level batching
+        to_sql      -> legacy pandas multi-row INSERT
+
+    Rows are upserted on id, so loading the same file again updates instead of failing.
+
+    progress_callback(stats) is called after every chunk (loaded or skipped) with the running
+    totals. With skip_bad_chunks, a chunk that fails is rolled back and recorded in `errors`
+    instead of aborting the whole load.
     """
-    CHUNK_SIZE = 50000
+    method = resolve_method(method)
     total_rows = 0
+    chunk_stats = []
+    errors = []
     start_time = time.time()
 
-    print(f"Starting ingestion of {file_path}...")
-
-    # Iterate over the CSV in chunks
-    for chunk in pd.read_csv(file_path, chunksize=CHUNK_SIZE):
-        
-        # Rename columns to match SQLAlchemy model if necessary
-        # Ensure column names in CSV match: id, name, age, etc.
-        chunk.rename(columns={
-            'sys_bp': 'sys_bp',
-            'dia_bp': 'dia_bp', 
-            # Add mappings if CSV headers differ from DB columns
-        }, inplace=True)
-
-        # Basic Cleaning
-        chunk.fillna(0, inplace=True)
-        
-        # Add timestamp
-        chunk['created_at'] = pd.Timestamp.now()
-
-        # Bulk Insert using pandas to_sql (efficient method)
-        chunk.to_sql('patients', engine, if_exists='append', index=False, method='multi')
-        
-        total_rows += len(chunk)
-        print(f"Processed {total_rows} rows...")
+    print(f"Starting ingestion of {file_path} (method={method})...")
+
+    def report(chunks_done, last_chunk_rows_per_second):
+        if progress_callback:
+            elapsed = time.time() - start_time
+            progress_callback({
+                "chunks_done": chunks_done,
+                "rows_done": total_rows,
+                "rows_per_second": round(total_rows / elapsed) if elapsed > 0 else 0,
+                "last_chunk_rows_per_second": round(last_chunk_rows_per_second),
+                "errors": list(errors)
+            })
+
+    raw_conn = engine.raw_connection()
+    try:
+        # Iterate over the CSV in chunks
+        for i, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_size)):
+            chunk_start = time.time()
+            chunk = prepare_chunk(chunk)
+
+            try:
+                # Stored day/zone of rows this chunk overwrites, read before the upsert
+                replaced = census_rollup.replaced_counts_raw(raw_conn, engine.dialect.paramstyle, chunk["id"]) \
+                    if "id" in chunk.columns else None
+                if method == "copy":
+                    copy_chunk(raw_conn, chunk)
+                elif method == "executemany":
+                    executemany_chunk(raw_conn, chunk)
+                else:
+                    chunk.to_sql('patients', engine, if_exists='append', index=False, method=to_sql_upsert)
+                # Same transaction as the COPY/executemany rows (to_sql commits on its own connection)
+                census_rollup.record_added_raw(raw_conn, engine.dialect.paramstyle,
+                                               chunk.get("admission_date", [None] * len(chunk)),
+                                               chunk.get("zone", [None] * len(chunk)), replaced=replaced)
+                raw_conn.commit()
+                # Overwritten rows are not new rows: listeners then get "something changed" instead
+                overwrote = replaced is not None and not replaced.empty
+                notify_patients_changed(len(chunk), None if overwrote else chunk)
+            except Exception as e:
+                if not skip_bad_chunks:
+                    raise
+                raw_conn.rollback()
+                errors.append(f"Chunk {i + 1}: {e}")
+                print(f"Chunk {i + 1} failed and was skipped: {e}")
+                report(i + 1, 0.0)
+                continue
+
+            chunk_seconds = time.time() - chunk_start
+            rows_per_second = len(chunk) / chunk_seconds if chunk_seconds > 0 else 0.0
+            chunk_stats.append({"chunk": i + 1, "rows": len(chunk), "rows_per_second": round(rows_per_second)})
+
+            total_rows += len(chunk)
+            print(f"Chunk {i + 1}: {len(chunk)} rows in {chunk_seconds:.2f}s "
+                  f"({rows_per_second:,.0f} rows/s) | Processed {total_rows} rows...")
+
+            report(i + 1, rows_per_second)
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
 
     duration = time.time() - start_time
     return {
-        "status": "success", 
-        "total_rows": total_rows, 
-        "duration_seconds": round(duration, 2)
-    }
\ No newline at end of file
+        "status": "success" if not errors else "partial",
+        "method": method,
+        "total_rows": total_rows,
+        "duration_seconds": round(duration, 2),
+        "rows_per_second": round(total_rows / duration) if duration > 0 else 0,
+        "chunks": chunk_stats,
+        "errors": errors
+    }
+
+
+def run_ingestion_job(job, file_path: str):
+    """
+    Background-job entry point for API uploads: loads the file, streaming progress into the job.
+    The uploaded file is removed once it has been loaded cleanly.
+    """
+    def on_progress(stats):
+        errors = stats.pop("errors")
+        job.update(**stats)
+        job.errors = errors
+
+    result = ingest_csv_to_db(file_path, progress_callback=on_progress, skip_bad_chunks=True)
+    job.errors = result["errors"]
+    if not result["errors"]:
+        os.remove(file_path)
+    result.pop("chunks")
+    return result
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def lttb_indices(x, y, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `max_points` indices of the series (x ascending) that
+    keep its visual shape. The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previous pick and the next
+    bucket's average, so spikes and dips survive where plain striding or averaging drop them.
+    Returns every index when the series already fits.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    # Bucket i spans [edges[i], edges[i + 1]) over the interior points 1..n-2
+    edges = (np.arange(max_points - 1) * (n - 2) / (max_points - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # Average of each following bucket, all at once from prefix sums; the last pick targets point n-1
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[2:] - edges[1:-1]
+    next_x = np.append((cum_x[edges[2:]] - cum_x[edges[1:-1]]) / sizes, x[-1])
+    next_y = np.append((cum_y[edges[2:]] - cum_y[edges[1:-1]]) / sizes, y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        px, py = x[previous], y[previous]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((px - next_x[bucket]) * (y[start:end] - py) - (px - x[start:end]) * (next_y[bucket] - py))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
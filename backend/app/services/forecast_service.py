@@ -0,0 +1,80 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import joblib
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Written by app/ml/train.py
+CENSUS_MODEL_PATH = os.path.join(BASE_DIR, "app", "ml", "census_model.joblib")
+
+# Every forecast is computed to this horizon once and sliced, so any horizon up to it is free
+MAX_HORIZON_DAYS = 30
+MAX_CACHED_FORECASTS = 16
+
+
+class ForecastService:
+    """
+    Serves census forecasts from the Prophet model trained by `train_census_model`.
+    The model is loaded once and reloaded only when the artifact changes on disk (mtime/size,
+    confirmed by content hash). Forecasts are memoized per (model version, start date).
+    """
+    def __init__(self, model_path: str = CENSUS_MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+        self.version = None
+        self._stamp = None
+        self._forecasts = OrderedDict()
+        self._lock = threading.RLock()
+
+    def forecast(self, start_date: date, horizon: int = 7):
+        """[{"date", "count"}] for `horizon` days from `start_date`; [] when no model is trained."""
+        with self._lock:
+            if not self._ensure_model():
+                return []
+            key = (self.version, start_date)
+            points = self._forecasts.get(key)
+            if points is None or len(points) < horizon:
+                points = self._predict(start_date, max(horizon, MAX_HORIZON_DAYS))
+                self._forecasts[key] = points
+                while len(self._forecasts) > MAX_CACHED_FORECASTS:
+                    self._forecasts.popitem(last=False)
+            self._forecasts.move_to_end(key)
+            return points[:horizon]
+
+    def _predict(self, start_date: date, horizon: int):
+        future_df = pd.DataFrame({"ds": pd.date_range(start=start_date, periods=horizon)})
+        forecast = self.model.predict(future_df)
+        return [
+            {"date": ds.strftime('%Y-%m-%d'), "count": max(0, int(yhat))}
+            for ds, yhat in zip(forecast['ds'], forecast['yhat'])
+        ]
+
+    def _ensure_model(self) -> bool:
+        """Loads the model on first use and whenever the file changes. Returns False if missing."""
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            if self.model is None:
+                print(f"⚠️ Forecast Service: census model not found at {self.model_path}")
+            return self.model is not None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return True
+
+        with open(self.model_path, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+        if version != self.version:
+            self.model = joblib.load(self.model_path)
+            self.version = version
+            self._forecasts.clear()
+            print(f"✅ Forecast Service: census model {version} loaded.")
+        self._stamp = stamp
+        return True
+
+
+forecast_service = ForecastService()
@@ -0,0 +1,86 @@
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import dashboard_cache
+from app.models.patient import Patient
+from app.services import analytics_queries as queries
+
+CENSUS_WINDOW_DAYS = 14
+VIRTUAL_BED_CAPACITY = 5000
+RISK_LEVELS = ["Low", "Medium", "High", "Critical"]
+
+# No discharge date or readmission flag is stored for patients, so these two KPIs cannot be
+# derived from the data yet; they stay at the reference values and are flagged as estimates.
+ESTIMATED_KPIS = {"avgLos": 4.2, "readmissionRate": 12.4}
+
+
+def normalize_risk_level(level):
+    if not level:
+        return None
+    level = str(level).capitalize()
+    return "Medium" if level == "Moderate" else level
+
+
+def kpi_snapshot_query(census_start, census_end):
+    """
+    One pass: patients per (zone, risk_level) plus how many were admitted in the census window.
+    COUNT(*) FILTER (WHERE ...) on PostgreSQL and SQLite >= 3.30; served by the covering
+    ix_patients_zone_risk_level_admission index.
+    """
+    in_window = and_(*queries.admitted_between(census_start, census_end))
+    return (select(Patient.zone, Patient.risk_level, func.count(), func.count().filter(in_window))
+            .group_by(Patient.zone, Patient.risk_level))
+
+
+class KPIEngine:
+    """
+    Computes every headline dashboard number from one pass over `patients`:
+    GROUP BY (zone, risk_level) with a conditional COUNT for the trailing census window.
+    KPIs, the risk distribution and the per-zone breakdown are all views of that snapshot.
+    """
+
+    @dashboard_cache.memoize("kpi_snapshot")
+    def snapshot(self, db: Session) -> dict:
+        # Index probe, not a table pass
+        anchor = db.execute(queries.latest_admission()).scalar()
+        if anchor is None:
+            return {"census": 0, "total": 0, "risk": {level: 0 for level in RISK_LEVELS}, "zones": {}}
+
+        rows = db.execute(kpi_snapshot_query(*queries.trailing_window(anchor, CENSUS_WINDOW_DAYS))).all()
+
+        risk = {level: 0 for level in RISK_LEVELS}
+        zones = {}
+        census = total = 0
+        for zone, level, count, zone_census in rows:
+            level = normalize_risk_level(level)
+            total += count
+            census += zone_census
+            if level in risk:
+                risk[level] += count
+            bucket = zones.setdefault(zone or "Unassigned", {"patients": 0, "census": 0, **{lvl: 0 for lvl in RISK_LEVELS}})
+            bucket["patients"] += count
+            bucket["census"] += zone_census
+            if level in bucket:
+                bucket[level] += count
+
+        return {"census": census, "total": total, "risk": risk, "zones": zones}
+
+    def kpis(self, db: Session) -> dict:
+        census = self.snapshot(db)["census"]
+        return {
+            "activePatients": int(census),
+            **ESTIMATED_KPIS,
+            "virtualBedUtilization": round(float(census / VIRTUAL_BED_CAPACITY) * 100, 1),
+            "estimated": list(ESTIMATED_KPIS),
+        }
+
+    def risk_distribution(self, db: Session) -> list:
+        risk = self.snapshot(db)["risk"]
+        return [{"name": level, "value": risk[level]} for level in RISK_LEVELS]
+
+    def zone_breakdown(self, db: Session) -> list:
+        zones = self.snapshot(db)["zones"]
+        return [{"zone": zone, **counts} for zone, counts in sorted(zones.items())]
+
+
+kpi_engine = KPIEngine()
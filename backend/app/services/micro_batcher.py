@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+
+import numpy as np
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+DELAY_SAMPLES = 2048
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one vectorized call.
+
+    `submit(item)` returns a Future. A worker thread takes the first waiting item, keeps
+    collecting until `max_items` are queued or `max_wait` seconds have passed since that first
+    item, then calls `batch_fn(items)` once and resolves each Future with its own result
+    (`batch_fn` must return one result per item, in order). An exception from `batch_fn`
+    fails every Future in that batch. Futures cancelled before their batch starts (e.g. a caller
+    that gave up waiting) are dropped from it.
+
+    Metrics: batch-size histogram, and queueing delay (submit -> batch start) percentiles over
+    the last DELAY_SAMPLES items, so the window can be tuned for latency vs throughput.
+    """
+    def __init__(self, batch_fn, max_items: int = 64, max_wait: float = 0.002, name: str = "micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram_overflow = 0
+        self._delays = deque(maxlen=DELAY_SAMPLES)
+        self._batches = 0
+        self._items = 0
+        self._failures = 0
+        self._cancelled = 0
+
+    def submit(self, item) -> Future:
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout: float = None):
+        """
+        Blocking convenience wrapper: submit and wait for this item's result. After `timeout`
+        seconds raises concurrent.futures.TimeoutError and withdraws the item if not yet started.
+        """
+        future = self.submit(item)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            future.cancel()
+            raise
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            delays_ms = np.array(self._delays) * 1000
+            histogram = {f"<={bucket}": count for bucket, count in self._histogram.items()}
+            histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = self._histogram_overflow
+            return {
+                "maxItems": self.max_items,
+                "maxWaitMs": self.max_wait * 1000,
+                "batches": self._batches,
+                "items": self._items,
+                "failedBatches": self._failures,
+                "cancelledItems": self._cancelled,
+                "meanBatchSize": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "batchSizeHistogram": histogram,
+                "queueDelayMs": {
+                    "p50": round(float(np.percentile(delays_ms, 50)), 3),
+                    "p95": round(float(np.percentile(delays_ms, 95)), 3),
+                    "p99": round(float(np.percentile(delays_ms, 99)), 3),
+                    "max": round(float(delays_ms.max()), 3),
+                } if len(delays_ms) else None,
+                "pending": self._queue.qsize(),
+            }
+
+    # --- Worker -----------------------------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_items:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # Marks every Future running, so a late cancel() can no longer race with set_result
+        live = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if len(live) < len(batch):
+            with self._stats_lock:
+                self._cancelled += len(batch) - len(live)
+        batch = live
+        if not batch:
+            return
+        started = time.perf_counter()
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            results, error = None, e
+        else:
+            error = None
+
+        for i, (_, future, _) in enumerate(batch):
+            if error is None:
+                future.set_result(results[i])
+            else:
+                future.set_exception(error)
+        self._record(len(batch), [started - submitted for _, _, submitted in batch], error is not None)
+
+    def _record(self, size: int, delays, failed: bool):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._failures += failed
+            self._delays.extend(delays)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self._histogram[bucket] += 1
+                    break
+            else:
+                self._histogram_overflow += 1
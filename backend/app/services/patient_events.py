@@ -0,0 +1,38 @@
+import threading
+from app.core.cache import bump_generation
+
+# Callbacks run synchronously on the writer's thread after every committed patient write:
+# listener(rows, records) -> None. Keep them cheap; hand real work to a thread of your own.
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def add_listener(listener):
+    with _listeners_lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _listeners_lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def notify_patients_changed(rows: int = 1, records=None):
+    """
+    Called by every patient write path *after* its transaction commits.
+    Bumps the cache generation so dashboards recompute from the new data, then tells listeners.
+    `records` (list of dicts or DataFrame) are the inserted rows when the writer has them;
+    None means "something changed" (e.g. upserts), and listeners must not assume row data.
+    """
+    if not rows:
+        return
+    bump_generation()
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(rows, records)
+        except Exception as e:
+            print(f"⚠️ Patient change listener failed: {e}")
@@ -0,0 +1,51 @@
+from sqlalchemy import or_, and_, text
+
+from app.db.indexes import SQLITE_NAME_FTS_TABLE, search_index_available
+from app.models.patient import Patient
+
+# Trigram indexes (pg_trgm / FTS5 trigram) need at least 3 characters to narrow anything
+MIN_INDEXED_TERM = 3
+
+
+class PatientSearch:
+    """
+    Builds the `search` filter for patient listings: substring match on name OR prefix
+    match on patient ID, phrased so the dialect's index can serve it.
+    - PostgreSQL: ILIKE '%term%' (pg_trgm GIN) / LIKE 'PAT-12%' (text_pattern_ops)
+    - SQLite: FTS5 trigram MATCH / id range predicate on the primary key
+    Without an index (short terms, missing extension) it degrades to a plain ILIKE scan.
+    """
+    def __init__(self):
+        self._fts_ready = {}
+
+    def clause(self, term: str, bind):
+        term = term.strip()
+        return or_(self._name_clause(term, bind), self._id_prefix_clause(term.upper(), bind.dialect.name))
+
+    def _name_clause(self, term: str, bind):
+        if bind.dialect.name == "sqlite" and len(term) >= MIN_INDEXED_TERM and self._has_fts(bind):
+            phrase = '"' + term.replace('"', '""') + '"'
+            return text(
+                f"patients.rowid IN (SELECT rowid FROM {SQLITE_NAME_FTS_TABLE} "
+                f"WHERE {SQLITE_NAME_FTS_TABLE} MATCH :name_phrase)"
+            ).bindparams(name_phrase=phrase)
+        return Patient.name.ilike(f"%{_escape_like(term)}%", escape="\\")
+
+    def _id_prefix_clause(self, prefix: str, dialect_name: str):
+        if dialect_name == "sqlite":
+            # SQLite's LIKE is case-insensitive and so can't use the PK index; a range can
+            return and_(Patient.id >= prefix, Patient.id < prefix + "\U0010ffff")
+        return Patient.id.like(f"{_escape_like(prefix)}%", escape="\\")
+
+    def _has_fts(self, bind) -> bool:
+        engine = getattr(bind, "engine", bind)
+        if engine not in self._fts_ready:
+            self._fts_ready[engine] = search_index_available(engine)
+        return self._fts_ready[engine]
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+patient_search = PatientSearch()
@@ -0,0 +1,130 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+# Engineered features are rounded to this many decimals for the key, so float noise in derived
+# values (MAP, shock index) cannot split one set of vitals into several entries
+KEY_DECIMALS = 6
+
+
+def _deep_size(obj) -> int:
+    """Approximate bytes held by a JSON-like value (dicts, lists, strings, numbers)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key) + _deep_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(item) for item in obj)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "stored_at")
+
+    def __init__(self, value, size, stored_at):
+        self.value = value
+        self.size = size
+        self.stored_at = stored_at
+
+
+class PredictionCache:
+    """
+    LRU + TTL cache of POST /ml/predict responses, so re-scoring the same vitals (virtual ward
+    polling) is a dictionary lookup instead of a model call.
+
+    Keys are (model version, engineered feature vector, sha256 of the clinical notes, SHAP on/off).
+    Bounded by entry count and by approximate memory; the least recently used entries go first.
+    Entries of another model version are never served, and the first lookup that sees a new
+    version drops the whole cache (a reload invalidates everything at once).
+
+    Cached responses are shared between requests: callers must not mutate them.
+    """
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(features: dict, version: str, notes: str, explained: bool):
+        vector = tuple(round(float(value), KEY_DECIMALS) for value in features.values())
+        digest = hashlib.sha256((notes or "").strip().encode("utf-8")).hexdigest()
+        return (version, vector, digest, explained)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._sync_version(key[0])
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if now - entry.stored_at >= self.ttl:
+                self._remove(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry.value
+
+    def put(self, key, value):
+        size = _deep_size(key) + _deep_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key[0] != self.version:
+                # Computed with a model that has been replaced meanwhile
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "modelVersion": self.version,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "memoryBytes": self._bytes,
+                "maxMemoryBytes": self.max_bytes,
+                "ttlSeconds": self.ttl,
+                **self._stats,
+                "hitRatio": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+    def _sync_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self.version = version
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+
+prediction_cache = PredictionCache(
+    ttl=settings.PREDICT_CACHE_TTL_SECONDS,
+    max_entries=settings.PREDICT_CACHE_MAX_ENTRIES,
+    max_bytes=int(settings.PREDICT_CACHE_MAX_MB * 1024 * 1024),
+)
@@ -0,0 +1,301 @@
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.services.patient_events import notify_patients_changed
+from app.services.risk_scorer import risk_scorer
+
+BACKFILL_CHUNK_SIZE = 20000
+BACKFILL_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+VITAL_COLUMNS = ['age', 'gender', 'sys_bp', 'dia_bp', 'heart_rate', 'spo2', 'temp', 'bmi']
+STAGE_TABLE = "risk_backfill_stage"
+
+# Only rows whose stored value actually changes are rewritten (and re-indexed)
+UPDATE_FROM_STAGE = {
+    "postgresql": f"""
+        UPDATE patients AS p SET risk_score = s.risk_score, risk_level = s.risk_level
+        FROM {STAGE_TABLE} AS s
+        WHERE p.id = s.id
+          AND (p.risk_score IS DISTINCT FROM s.risk_score OR p.risk_level IS DISTINCT FROM s.risk_level)
+    """,
+    "sqlite": f"""
+        UPDATE patients SET risk_score = s.risk_score, risk_level = s.risk_level
+        FROM {STAGE_TABLE} AS s
+        WHERE patients.id = s.id
+          AND (patients.risk_score IS NOT s.risk_score OR patients.risk_level IS NOT s.risk_level)
+    """,
+}
+
+
+# --- Scoring (runs in the process pool) -------------------------------------
+
+def _init_worker():
+    # One process per core already; XGBoost's own threads would only oversubscribe them
+    if risk_scorer.loaded:
+        risk_scorer.model.steps[-1][1].get_booster().set_param({"nthread": 1})
+
+
+def score_chunk(ids, vitals: pd.DataFrame):
+    """Same mapping as RiskScorer.score: arg-max class and its probability as a 0-100 score."""
+    levels, scores = risk_scorer.score(vitals)
+    return ids, levels.astype(str), scores.astype(float), risk_scorer.version
+
+
+# --- Reading ----------------------------------------------------------------
+
+def read_chunks(after_id: str = "", until_id: str = None, chunk_size: int = BACKFILL_CHUNK_SIZE):
+    """
+    Yields (ids, vitals) frames of `patients` in id order, for after_id < id <= until_id.
+
+    PostgreSQL streams one query through a server-side cursor. SQLite gets one keyset page per
+    chunk instead: a read cursor left open across the writer's commits would hold its lock.
+    """
+    columns = ["id"] + VITAL_COLUMNS
+    sql = f"SELECT {', '.join(columns)} FROM patients WHERE id > :after_id"
+    params = {"after_id": after_id or ""}
+    if until_id:
+        sql += " AND id <= :until_id"
+        params["until_id"] = until_id
+    sql += " ORDER BY id"
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(text(sql), params)
+            for rows in result.partitions(chunk_size):
+                frame = pd.DataFrame(rows, columns=columns)
+                yield frame["id"].to_numpy(), frame[VITAL_COLUMNS]
+        return
+
+    page = text(sql + " LIMIT :limit")
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(page, {**params, "limit": chunk_size}).fetchall()
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=columns)
+        yield frame["id"].to_numpy(), frame[VITAL_COLUMNS]
+        params["after_id"] = rows[-1][0]
+
+
+def count_rows(after_id: str = "", until_id: str = None) -> int:
+    sql = "SELECT COUNT(*) FROM patients WHERE id > :after_id"
+    params = {"after_id": after_id or ""}
+    if until_id:
+        sql += " AND id <= :until_id"
+        params["until_id"] = until_id
+    with engine.connect() as conn:
+        return conn.execute(text(sql), params).scalar()
+
+
+# --- Writing ----------------------------------------------------------------
+
+class StageWriter:
+    """
+    Writes scored chunks back set-based: the chunk is bulk loaded into a temp staging table
+    (COPY on PostgreSQL, executemany elsewhere), then one `UPDATE patients ... FROM stage` joins
+    it on id. One transaction per chunk, on a connection of its own.
+    """
+    def __init__(self):
+        self.dialect = engine.dialect.name
+        if self.dialect not in UPDATE_FROM_STAGE:
+            raise ValueError(f"Risk backfill supports PostgreSQL and SQLite, not {self.dialect}.")
+        self.raw_conn = engine.raw_connection()
+        cursor = self.raw_conn.cursor()
+        try:
+            if self.dialect == "postgresql":
+                cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} "
+                               f"(id TEXT PRIMARY KEY, risk_score DOUBLE PRECISION, risk_level TEXT) "
+                               f"ON COMMIT DELETE ROWS")
+            else:
+                cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} "
+                               f"(id TEXT PRIMARY KEY, risk_score REAL, risk_level TEXT)")
+            self.raw_conn.commit()
+        finally:
+            cursor.close()
+
+    def write(self, ids, levels, scores) -> int:
+        """Stages and applies one chunk; returns the number of patients whose risk changed."""
+        cursor = self.raw_conn.cursor()
+        try:
+            if self.dialect == "postgresql":
+                buffer = io.StringIO()
+                pd.DataFrame({"id": ids, "risk_score": scores, "risk_level": levels}).to_csv(
+                    buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {STAGE_TABLE} (id, risk_score, risk_level) FROM STDIN WITH (FORMAT csv)",
+                                   buffer)
+            else:
+                cursor.execute(f"DELETE FROM {STAGE_TABLE}")
+                cursor.executemany(f"INSERT INTO {STAGE_TABLE} (id, risk_score, risk_level) VALUES (?, ?, ?)",
+                                   zip(ids.tolist(), scores.tolist(), levels.tolist()))
+            cursor.execute(UPDATE_FROM_STAGE[self.dialect])
+            updated = cursor.rowcount
+            self.raw_conn.commit()
+            return updated
+        except Exception:
+            self.raw_conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.raw_conn.close()
+
+
+# --- Checkpoint -------------------------------------------------------------
+
+class BackfillCheckpoint:
+    """
+    JSON manifest of a backfill's progress: the id range, the model version it scores with and
+    `last_id`, the highest id whose chunk has been committed (chunks are committed in id order).
+    A rerun with the same range and model version resumes after `last_id`.
+    """
+    def __init__(self, path: str, after_id: str, until_id: str, model_version: str):
+        self.path = path
+        self.after_id = after_id or ""
+        self.until_id = until_id
+        self.model_version = model_version
+        self.last_id = self.after_id
+        self.rows_scored = 0
+        self.rows_updated = 0
+        self.complete = False
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            manifest = json.load(f)
+        if (manifest.get("after_id"), manifest.get("until_id"), manifest.get("model_version")) != \
+                (self.after_id, self.until_id, self.model_version):
+            print("ℹ️  Checkpoint is for a different id range or model version; starting over.")
+            return False
+        self.last_id = manifest["last_id"]
+        self.rows_scored = manifest.get("rows_scored", 0)
+        self.rows_updated = manifest.get("rows_updated", 0)
+        self.complete = manifest.get("complete", False)
+        return True
+
+    def save(self):
+        manifest = {
+            "after_id": self.after_id,
+            "until_id": self.until_id,
+            "model_version": self.model_version,
+            "last_id": self.last_id,
+            "rows_scored": self.rows_scored,
+            "rows_updated": self.rows_updated,
+            "complete": self.complete,
+            "updated_at": datetime.now().isoformat(),
+        }
+        # Write-then-rename so a crash never leaves a truncated manifest behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+# --- Driver -----------------------------------------------------------------
+
+def run_backfill(after_id: str = "", until_id: str = None, chunk_size: int = BACKFILL_CHUNK_SIZE,
+                 workers: int = BACKFILL_WORKERS, checkpoint_path: str = None, progress_callback=None):
+    """
+    Rescores every patient with after_id < id <= until_id using the trained risk model and
+    stores the model's risk_level / risk_score.
+
+    Chunks are read in id order, scored on a process pool (at most workers + 1 in flight, so
+    reading, scoring and writing overlap) and written back in order; after each commit
+    `last_id` is the resume point. With `checkpoint_path`, progress is persisted there and a
+    rerun over the same range and model version continues where it stopped.
+
+    progress_callback(stats) is called after every committed chunk with the running totals.
+    """
+    if not risk_scorer.loaded:
+        raise RuntimeError("Risk model not loaded.")
+    version = risk_scorer.version
+    checkpoint = BackfillCheckpoint(checkpoint_path, after_id, until_id, version) if checkpoint_path else None
+    if checkpoint and checkpoint.load():
+        if checkpoint.complete:
+            print(f"✅ Backfill already complete for model {version} ({checkpoint.rows_scored} rows).")
+            return {"status": "already_complete", "model_version": version, "last_id": checkpoint.last_id,
+                    "rows_scored": checkpoint.rows_scored, "rows_updated": checkpoint.rows_updated}
+        print(f"⏩ Resuming backfill after id {checkpoint.last_id} ({checkpoint.rows_scored} rows already scored).")
+    start_id = checkpoint.last_id if checkpoint else (after_id or "")
+
+    rows_total = count_rows(start_id, until_id)
+    print(f"🧮 Risk backfill: {rows_total} patients after id '{start_id}' with model {version} "
+          f"({workers} workers, chunks of {chunk_size})")
+    totals = {"rows_scored": 0, "rows_updated": 0, "chunks_done": 0, "last_id": start_id}
+    start_time = time.perf_counter()
+    writer = StageWriter()
+
+    def commit(future):
+        ids, levels, scores, worker_version = future.result()
+        if worker_version != version:
+            raise RuntimeError(f"Risk model changed during backfill ({version} -> {worker_version}); rerun it.")
+        updated = writer.write(ids, levels, scores)
+        if updated:
+            # Risk levels feed the dashboards and the analytics cube; the rows are upserts, not inserts
+            notify_patients_changed(updated)
+        totals["rows_scored"] += len(ids)
+        totals["rows_updated"] += updated
+        totals["chunks_done"] += 1
+        totals["last_id"] = str(ids[-1])
+        if checkpoint:
+            checkpoint.last_id = totals["last_id"]
+            checkpoint.rows_scored += len(ids)
+            checkpoint.rows_updated += updated
+            checkpoint.save()
+
+        elapsed = time.perf_counter() - start_time
+        rows_per_second = totals["rows_scored"] / elapsed if elapsed > 0 else 0.0
+        print(f"   ✅ Chunk {totals['chunks_done']}: {len(ids)} scored, {updated} changed | "
+              f"{totals['rows_scored']}/{rows_total} ({rows_per_second:,.0f} rows/s) | last id {totals['last_id']}")
+        if progress_callback:
+            progress_callback({**totals, "rows_total": rows_total, "rows_per_second": round(rows_per_second)})
+
+    try:
+        # spawn: the API runs this on a job thread, and forking a multi-threaded server is unsafe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker) as pool:
+            pending = deque()
+            for ids, vitals in read_chunks(start_id, until_id, chunk_size):
+                pending.append(pool.submit(score_chunk, ids, vitals))
+                if len(pending) > workers:
+                    commit(pending.popleft())
+            while pending:
+                commit(pending.popleft())
+    finally:
+        writer.close()
+
+    if checkpoint:
+        checkpoint.complete = True
+        checkpoint.save()
+    duration = time.perf_counter() - start_time
+    print(f"🎉 Risk backfill done: {totals['rows_scored']} scored, {totals['rows_updated']} changed "
+          f"in {duration:.1f}s ({totals['rows_scored'] / duration if duration > 0 else 0:,.0f} rows/s)")
+    return {
+        "status": "success",
+        "model_version": version,
+        "after_id": start_id,
+        "until_id": until_id,
+        **totals,
+        "duration_seconds": round(duration, 2),
+        "rows_per_second": round(totals["rows_scored"] / duration) if duration > 0 else 0,
+    }
+
+
+def run_backfill_job(job, after_id: str = "", until_id: str = None, chunk_size: int = BACKFILL_CHUNK_SIZE):
+    """
+    Background-job entry point for POST /ml/backfill. Progress (including `last_id`) streams into
+    the job; a failed job is resumed by submitting again with after_id = its last_id.
+    """
+    return run_backfill(after_id, until_id, chunk_size, progress_callback=lambda stats: job.update(**stats))
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ml.tree_ensemble import TreeEnsemble
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODEL_PATH = os.path.join(BASE_DIR, "app", "ml", "models", "risk_model.pkl")
+CLASSES_PATH = os.path.join(BASE_DIR, "app", "ml", "models", "classes.pkl")
+
+# Column order the risk pipeline was trained on
+FEATURE_COLUMNS = [
+    'age', 'gender', 'sys_bp', 'dia_bp', 'heart_rate', 'spo2', 'temp', 'bmi',
+    'pulse_pressure', 'map', 'shock_index'
+]
+
+# Batches up to this many rows are scored by the NumPy TreeEnsemble (bit-identical, ~0.3 ms for
+# one row against ~2-3 ms through pandas + DMatrix); larger ones by XGBoost, which is faster
+# from ~64 rows on (measured: 32 rows 1.5 vs 2.3 ms, 64 rows 2.9 vs 2.6 ms)
+TREE_ENSEMBLE_MAX_ROWS = 32
+
+
+def build_features(vitals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized version of the feature engineering in POST /ml/predict.
+    `vitals` uses the Patient column names (age, gender, sys_bp, dia_bp, heart_rate, spo2, temp, bmi).
+    """
+    sys_bp = vitals['sys_bp'].astype(float)
+    dia_bp = vitals['dia_bp'].astype(float)
+    heart_rate = vitals['heart_rate'].astype(float)
+    gender = vitals['gender'].astype(str).str.lower().isin(['m', 'male']).astype(int)
+    shock_index = np.where(sys_bp > 0, heart_rate / sys_bp.where(sys_bp > 0, 1.0), 0.0)
+
+    return pd.DataFrame({
+        'age': vitals['age'].astype(float),
+        'gender': gender,
+        'sys_bp': sys_bp,
+        'dia_bp': dia_bp,
+        'heart_rate': heart_rate,
+        'spo2': vitals['spo2'].astype(float),
+        'temp': vitals['temp'].astype(float),
+        'bmi': vitals['bmi'].astype(float),
+        'pulse_pressure': sys_bp - dia_bp,
+        'map': (sys_bp + 2 * dia_bp) / 3,
+        'shock_index': shock_index,
+    }, columns=FEATURE_COLUMNS).reset_index(drop=True)
+
+
+class RiskScorer:
+    """
+    Batch front-end to the XGBoost risk pipeline: one `predict_proba` call scores a whole frame.
+    The model is loaded once; `version` identifies the artifact on disk so callers can key caches
+    on it, and `reload_if_changed()` picks up a retrained model without a restart.
+
+    Small batches (single /predict requests, micro-batches) go through `ensemble`, the same
+    trees exported to NumPy arrays; if the export fails the pipeline scores everything.
+    """
+    def __init__(self, model_path: str = MODEL_PATH, classes_path: str = CLASSES_PATH):
+        self.model_path = model_path
+        self.classes_path = classes_path
+        self.model = None
+        self.ensemble = None
+        self.classes = None
+        self.version = None
+        self._stamp = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.load_model()
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def load_model(self):
+        try:
+            stamp = self._file_stamp()
+            model = joblib.load(self.model_path)
+            classes = np.asarray(joblib.load(self.classes_path))
+            with open(self.model_path, "rb") as f:
+                version = hashlib.sha256(f.read()).hexdigest()[:12]
+            try:
+                ensemble = TreeEnsemble.from_pipeline(model, classes)
+            except Exception as e:
+                ensemble = None
+                print(f"⚠️ Risk Scorer: NumPy export failed, small batches use the pipeline: {e}")
+            with self._lock:
+                self.model, self.ensemble, self.classes, self.version, self._stamp = \
+                    model, ensemble, classes, version, stamp
+            print(f"✅ Risk Scorer: model {version} loaded.")
+        except Exception as e:
+            print(f"❌ Risk Scorer: model load error: {e}")
+
+    def reload_if_changed(self, min_interval: float = 0.0) -> bool:
+        """
+        Cheap stat() check; reloads only when the artifact's mtime/size moved. With `min_interval`
+        the check runs at most once per that many seconds, so request paths can call it every time.
+        Callers arriving while another thread checks or reloads keep using the current model.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            now = time.monotonic()
+            if now - self._checked_at < min_interval:
+                return False
+            self._checked_at = now
+            try:
+                stamp = self._file_stamp()
+            except OSError:
+                return False
+            if stamp == self._stamp:
+                return False
+            self.load_model()
+            return self._stamp == stamp
+        finally:
+            self._reload_lock.release()
+
+    def predict_proba(self, features: pd.DataFrame) -> np.ndarray:
+        with self._lock:
+            model, ensemble = self.model, self.ensemble
+        if model is None:
+            raise RuntimeError("Risk model not loaded.")
+        if ensemble is not None and len(features) <= TREE_ENSEMBLE_MAX_ROWS:
+            # Frames from build_features / POST /predict are already in training order; selecting
+            # the columns anyway would cost more than scoring a row
+            ordered = features if list(features.columns) == FEATURE_COLUMNS else features.reindex(columns=FEATURE_COLUMNS)
+            return ensemble.predict_proba(ordered.to_numpy(dtype=np.float64))
+        return model.predict_proba(features[FEATURE_COLUMNS])
+
+    def score(self, vitals: pd.DataFrame):
+        """
+        Scores every row in one pass. Returns (risk_levels, risk_scores) using the same mapping
+        as POST /ml/predict: the arg-max class and its probability as a 0-100 integer.
+        """
+        if vitals.empty:
+            return np.array([], dtype=object), np.array([], dtype=int)
+        probs = self.predict_proba(build_features(vitals))
+        best = probs.argmax(axis=1)
+        return self.classes[best], (probs.max(axis=1) * 100).astype(int)
+
+    def _file_stamp(self):
+        stat = os.stat(self.model_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+risk_scorer = RiskScorer()
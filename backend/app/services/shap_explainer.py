@@ -0,0 +1,152 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import shap
+
+from app.core.config import settings
+from app.services.risk_scorer import FEATURE_COLUMNS, risk_scorer
+
+# Labels shown next to each attribution in `shapValues`
+FEATURE_LABELS = {
+    'age': 'Age',
+    'gender': 'Gender',
+    'sys_bp': 'Systolic BP',
+    'dia_bp': 'Diastolic BP',
+    'heart_rate': 'Heart Rate',
+    'spo2': 'SPO2',
+    'temp': 'Temperature',
+    'bmi': 'BMI',
+    'pulse_pressure': 'Pulse Pressure',
+    'map': 'MAP',
+    'shock_index': 'Shock Index',
+}
+
+
+class ShapExplainer:
+    """
+    Per-feature SHAP attributions for the XGBoost risk model (`shap.TreeExplainer`, exact
+    tree-path-dependent TreeSHAP).
+
+    - One explainer per model version: built lazily from `risk_scorer.model` and rebuilt when
+      `risk_scorer.version` changes, so a retrained artifact never gets explained with old trees.
+    - Batches: `explain(features, class_indices)` runs a single `shap_values` call for all the
+      rows that are not cached.
+    - LRU cache keyed by (model version, feature vector rounded to SHAP_QUANTIZE_DECIMALS).
+      Rows are explained at their rounded values, so a cached entry is exact for its key and
+      near-identical vitals share one computation. The cost is linear in rows (~9 ms each on
+      one CPU for 800 trees), which is why repeat vitals must not pay it again.
+
+    Values are contributions to the class margin (log-odds) of the scaled model input; each
+    feature's scaling is affine, so the attribution belongs to the raw feature unchanged.
+    """
+    def __init__(self, max_entries: int = None, decimals: int = None):
+        self.max_entries = max_entries or settings.SHAP_CACHE_SIZE
+        self.decimals = settings.SHAP_QUANTIZE_DECIMALS if decimals is None else decimals
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._explainer = None
+        self._explainer_version = None
+        self._explainer_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+    def explain(self, features: pd.DataFrame, class_indices) -> list:
+        """
+        `features` as built by `build_features`; `class_indices[i]` is the class whose attributions
+        row i gets (normally the predicted one). Returns one `shapValues` list per row, sorted by
+        absolute contribution.
+        """
+        if len(features) == 0:
+            return []
+        model, version = risk_scorer.model, risk_scorer.version
+        if model is None:
+            raise RuntimeError("Risk model not loaded.")
+
+        quantized = np.round(features[FEATURE_COLUMNS].to_numpy(dtype=np.float64), self.decimals)
+        keys = [(version, row.tobytes()) for row in quantized]
+        values = [None] * len(keys)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    values[i] = cached
+            hits = sum(value is not None for value in values)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            # Duplicate vectors within the batch are explained once
+            unique = list({keys[i]: i for i in missing}.values())
+            computed = self._shap_values(model, version, quantized[unique])
+            fresh = dict(zip((keys[i] for i in unique), computed))
+            with self._cache_lock:
+                for key, value in fresh.items():
+                    self._cache[key] = value
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            for i in missing:
+                values[i] = fresh[keys[i]]
+
+        return [self._format(value[:, int(k)]) for value, k in zip(values, class_indices)]
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            lookups = self.hits + self.misses
+            return {
+                "modelVersion": self._explainer_version,
+                "explainerBuilds": self.builds,
+                "entries": len(self._cache),
+                "maxEntries": self.max_entries,
+                "quantizeDecimals": self.decimals,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    # --- Internals --------------------------------------------------------
+
+    def _shap_values(self, model, version, rows: np.ndarray) -> np.ndarray:
+        """(rows x features x classes) attributions for raw feature rows, one TreeSHAP pass."""
+        scaler = model.steps[0][1]
+        scaled = scaler.transform(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+        values = self._explainer_for(model, version).shap_values(scaled)
+        if isinstance(values, list):
+            # shap < 0.45 returns one (rows x features) array per class
+            return np.stack(values, axis=-1).astype(np.float32)
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim == 2:
+            # Binary models explain the single log-odds margin of class 1; class 0's is its negation
+            values = np.stack([-values, values], axis=-1)
+        return values
+
+    def _explainer_for(self, model, version):
+        """
+        The explainer of `version`, built on first use. Only the build is serialised: TreeSHAP
+        passes on an existing explainer run concurrently, so misses do not queue behind each other.
+        """
+        with self._explainer_lock:
+            if self._explainer_version != version:
+                self._explainer = shap.TreeExplainer(model.steps[-1][1])
+                self._explainer_version = version
+                self.builds += 1
+                print(f"🧮 SHAP Explainer: TreeExplainer built for model {version}.")
+            return self._explainer
+
+    @staticmethod
+    def _format(contributions: np.ndarray) -> list:
+        order = np.argsort(-np.abs(contributions), kind="stable")
+        return [{"feature": FEATURE_LABELS[FEATURE_COLUMNS[j]], "value": round(float(contributions[j]), 3)}
+                for j in order]
+
+
+shap_explainer = ShapExplainer()
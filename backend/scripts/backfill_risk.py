@@ -0,0 +1,32 @@
+"""
+Rescores the stored patients with the trained risk model (risk_level / risk_score), replacing
+the ingest-time heuristic values. Resumable: progress is checkpointed per committed chunk and a
+rerun over the same id range and model version continues after the last committed id.
+
+Usage: python scripts/backfill_risk.py [--after-id ID] [--until-id ID] [--chunk-size N] [--workers N] [--restart]
+"""
+import sys
+import os
+import argparse
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.risk_backfill import BACKFILL_CHUNK_SIZE, BACKFILL_WORKERS, run_backfill
+
+CHECKPOINT_PATH = "data/risk_backfill.checkpoint.json"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table-wide risk model backfill")
+    parser.add_argument("--after-id", default="", help="Only rescore ids greater than this")
+    parser.add_argument("--until-id", default=None, help="Only rescore ids up to and including this")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and rescore the whole range")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.checkpoint) or ".", exist_ok=True)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    run_backfill(args.after_id, args.until_id, args.chunk_size, args.workers, checkpoint_path=args.checkpoint)
@@ -0,0 +1,77 @@
+"""
+Measures POST /ml/predict under concurrency with and without micro-batching: the same
+requests are fired from a thread pool (as FastAPI's threadpool would run them), first with
+one model call per request, then through `predict_batcher`. Results must be identical.
+The SHAP cache is cleared before each pass, so both explain every request from scratch.
+
+Usage: python scripts/benchmark_microbatch.py [requests] [concurrency]
+"""
+import sys
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.config import settings
+from app.api.v1.endpoints.ml import PredictionInput, predict_batcher, predict_risk
+from app.services.shap_explainer import shap_explainer
+
+DEFAULT_REQUESTS = 2000
+DEFAULT_CONCURRENCY = 32
+
+
+def random_input(rng):
+    return PredictionInput(
+        age=rng.randint(18, 95), gender=rng.choice(["M", "F"]),
+        systolicBp=rng.randint(80, 200), diastolicBp=rng.randint(40, 120), heartRate=rng.randint(40, 160),
+        spo2=round(rng.uniform(82, 100), 1), temp=round(rng.uniform(35, 40.5), 1), bmi=round(rng.uniform(16, 45), 1),
+    )
+
+
+def run(inputs, concurrency, batched):
+    settings.PREDICT_MICROBATCH_ENABLED = batched
+    shap_explainer.clear()  # both passes start with a cold SHAP cache
+    latencies = []
+
+    def call(item):
+        start = time.perf_counter()
+        result = predict_risk(item)
+        latencies.append(time.perf_counter() - start)
+        return result["riskLevel"], result["riskScore"], result["readmissionProbability"], result["shapValues"]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, inputs))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"{'micro-batched' if batched else 'per-request':>14}: {len(inputs) / elapsed:8.0f} req/s | "
+          f"p50 {p50:6.1f} ms | p95 {p95:6.1f} ms")
+    return results
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CONCURRENCY
+    settings.PREDICT_CACHE_ENABLED = False  # every request must reach the model
+    rng = random.Random(7)
+    inputs = [random_input(rng) for _ in range(requests)]
+    print(f"⚡ {requests} predictions, {concurrency} concurrent, window "
+          f"{settings.PREDICT_MICROBATCH_WINDOW_MS} ms / {settings.PREDICT_MICROBATCH_MAX_ITEMS} items")
+
+    baseline = run(inputs, concurrency, batched=False)
+    batched = run(inputs, concurrency, batched=True)
+    print(f"✅ Identical results: {baseline == batched}")
+
+    stats = predict_batcher.stats()
+    print(f"📊 {stats['batches']} model calls for {stats['items']} requests "
+          f"(mean batch {stats['meanBatchSize']}); queue delay {stats['queueDelayMs']}")
+    print(f"   Batch sizes: {stats['batchSizeHistogram']}")
+
+
+if __name__ == "__main__":
+    main()
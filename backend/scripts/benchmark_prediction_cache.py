@@ -0,0 +1,79 @@
+"""
+Virtual-ward workload for the POST /ml/predict response cache: a ward of patients whose vitals
+are re-scored on every poll. Compares latency with the cache off and on, checks that cached
+responses equal freshly computed ones, reports hit ratio / memory, and checks that a model
+version change invalidates the cache.
+
+Usage: python scripts/benchmark_prediction_cache.py [patients] [polls]
+"""
+import sys
+import os
+import random
+import time
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.config import settings
+from app.api.v1.endpoints.ml import predict_risk
+from app.services.prediction_cache import prediction_cache
+from app.services.risk_scorer import risk_scorer
+from scripts.benchmark_microbatch import random_input
+
+DEFAULT_PATIENTS = 200
+DEFAULT_POLLS = 10
+NOTES = ["", "Known hypertension, on lisinopril.", "Fever and cough since yesterday, possible pneumonia."]
+
+
+def run(requests):
+    results, timings = [], []
+    for item in requests:
+        start = time.perf_counter()
+        results.append(predict_risk(item))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return results, timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000, sum(timings)
+
+
+def main():
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PATIENTS
+    polls = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_POLLS
+    rng = random.Random(3)
+    ward = []
+    for _ in range(patients):
+        item = random_input(rng)
+        item.clinicalNotes = rng.choice(NOTES)
+        ward.append(item)
+    requests = ward * polls
+    print(f"🏥 {patients} patients x {polls} polls = {len(requests)} predictions")
+
+    settings.PREDICT_CACHE_ENABLED = False
+    predict_risk(ward[0])  # warm-up (SHAP explainer build)
+    baseline, p50, p95, total = run(requests)
+    print(f"{'cache off':>10}: p50 {p50:6.2f} ms | p95 {p95:6.2f} ms | total {total:6.2f} s")
+
+    settings.PREDICT_CACHE_ENABLED = True
+    prediction_cache.invalidate()
+    cached, p50, p95, total = run(requests)
+    print(f"{'cache on':>10}: p50 {p50:6.3f} ms | p95 {p95:6.2f} ms | total {total:6.2f} s")
+    identical = baseline == cached
+    print(f"{'✅' if identical else '❌'} Identical responses: {identical}")
+
+    stats = prediction_cache.stats()
+    print(f"📊 hit ratio {stats['hitRatio']} | {stats['entries']} entries | "
+          f"{stats['memoryBytes'] / 1024:.0f} KiB ({stats['memoryBytes'] / max(stats['entries'], 1):.0f} B/entry)")
+
+    # A reload (new version) must drop everything
+    version = risk_scorer.version
+    risk_scorer.version = f"{version}-reloaded"
+    try:
+        predict_risk(ward[0])
+        invalidated = prediction_cache.stats()["entries"] == 1
+    finally:
+        risk_scorer.version = version
+    print(f"{'✅' if invalidated else '❌'} Model version change invalidates the cache: {invalidated}")
+    sys.exit(0 if identical and invalidated else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures patient search latency: the legacy unindexed `name ILIKE '%term%'` scan against
+the index-backed search used by GET /patients (pg_trgm on PostgreSQL, FTS5 on SQLite).
+Run it against a database loaded with the 1M-row dataset (scripts/seed_db.py).
+
+Usage: python scripts/benchmark_search.py [term ...]
+"""
+import sys
+import os
+import time
+from sqlalchemy import desc, func
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.session import engine, SessionLocal
+from app.db.indexes import ensure_search_index, search_index_available
+from app.models.patient import Patient
+from app.services.patient_search import patient_search
+
+REPEATS = 5
+PAGE_SIZE = 50
+DEFAULT_TERMS = ["Patient_a1", "3f9c", "c0ffee", "PAT-10000", "pat-1999"]
+
+
+def legacy_query(db, term):
+    return (db.query(Patient).filter(Patient.name.ilike(f"%{term}%"))
+            .order_by(desc(Patient.admission_date), desc(Patient.id)).limit(PAGE_SIZE))
+
+
+def indexed_query(db, term):
+    return (db.query(Patient).filter(patient_search.clause(term, db.get_bind()))
+            .order_by(desc(Patient.admission_date), desc(Patient.id)).limit(PAGE_SIZE))
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings) * 1000
+
+
+def main():
+    terms = sys.argv[1:] or DEFAULT_TERMS
+    ensure_search_index(engine)
+    db = SessionLocal()
+    try:
+        total = db.query(func.count(Patient.id)).scalar()
+        print(f"Database: {engine.dialect.name}, {total:,} patients, "
+              f"search index {'present' if search_index_available(engine) else 'MISSING'}")
+        print(f"{'term':14}{'matches':>10}{'legacy ms':>12}{'indexed ms':>12}{'speedup':>10}")
+        for term in terms:
+            legacy_rows, legacy_ms = best_of(lambda: legacy_query(db, term).all())
+            indexed_rows, indexed_ms = best_of(lambda: indexed_query(db, term).all())
+            # Indexed search also matches ID prefixes, so it returns a superset of the legacy rows
+            missing = {p.id for p in legacy_rows} - {p.id for p in indexed_rows}
+            if missing and len(indexed_rows) < PAGE_SIZE:
+                print(f"❌ {term}: indexed search lost {len(missing)} rows")
+            print(f"{term:14}{len(indexed_rows):>10}{legacy_ms:12.1f}{indexed_ms:12.1f}{legacy_ms / indexed_ms:9.1f}x")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cost of real SHAP attributions on POST /ml/predict: latency without SHAP, on a cache miss and on
+a cache hit, plus a 1k-row batch explanation. Also checks that the attributions are additive
+(base value + contributions == the model's class margin) for the explained rows.
+
+Usage: python scripts/benchmark_shap.py [requests]
+"""
+import sys
+import os
+import random
+import time
+import numpy as np
+import xgboost as xgb
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.config import settings
+from app.api.v1.endpoints.ml import predict_risk
+from app.services.risk_scorer import FEATURE_COLUMNS, build_features, risk_scorer
+from app.services.shap_explainer import shap_explainer
+from scripts.benchmark_microbatch import random_input
+from scripts.check_tree_ensemble import random_vitals
+
+DEFAULT_REQUESTS = 300
+BATCH_ROWS = 1000
+
+
+def latencies(inputs):
+    timings = []
+    for item in inputs:
+        start = time.perf_counter()
+        predict_risk(item)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+
+def check_additivity(rows: int = 200) -> bool:
+    features = build_features(random_vitals(rows, seed=5))
+    # Explanations are computed at the quantised vector, so compare against its margin
+    quantized = features.round(shap_explainer.decimals)
+    raw = shap_explainer._shap_values(risk_scorer.model, risk_scorer.version,
+                                      quantized[FEATURE_COLUMNS].to_numpy())
+    scaler, classifier = risk_scorer.model.steps[0][1], risk_scorer.model.steps[-1][1]
+    margins = classifier.get_booster().predict(xgb.DMatrix(scaler.transform(quantized[FEATURE_COLUMNS])),
+                                               output_margin=True)
+    base = np.asarray(shap_explainer._explainer.expected_value, dtype=np.float64)
+    error = np.abs(raw.sum(axis=1) + base - margins).max()
+    print(f"{'✅' if error < 1e-3 else '❌'} Additivity: max |base + sum(shap) - margin| = {error:.2g}")
+    return error < 1e-3
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    settings.PREDICT_CACHE_ENABLED = False  # every request must reach the model
+    rng = random.Random(11)
+    inputs = [random_input(rng) for _ in range(requests)]
+
+    settings.SHAP_ENABLED = False
+    predict_risk(inputs[0])
+    off = latencies(inputs)
+    settings.SHAP_ENABLED = True
+    predict_risk(inputs[0])  # builds the explainer
+    shap_explainer.clear()
+    miss = latencies(inputs)
+    hit = latencies(inputs)
+
+    print(f"⚡ POST /ml/predict, {requests} requests (p50 / p95)")
+    for label, (p50, p95) in [("no SHAP", off), ("SHAP, cache miss", miss), ("SHAP, cache hit", hit)]:
+        print(f"{label:>18}: {p50:6.2f} ms / {p95:6.2f} ms")
+
+    features = build_features(random_vitals(BATCH_ROWS, seed=9))
+    classes = risk_scorer.predict_proba(features).argmax(axis=1)
+    shap_explainer.clear()
+    start = time.perf_counter()
+    shap_explainer.explain(features, classes)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    shap_explainer.explain(features, classes)
+    warm = time.perf_counter() - start
+    print(f"📦 {BATCH_ROWS}-row batch explain: {cold * 1000:.0f} ms cold, {warm * 1000:.1f} ms cached")
+    print(f"📊 {shap_explainer.stats()}")
+
+    sys.exit(0 if check_additivity() else 1)
+
+
+if __name__ == "__main__":
+    main()
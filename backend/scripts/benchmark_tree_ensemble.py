@@ -0,0 +1,58 @@
+"""
+Latency of the risk model: sklearn Pipeline + XGBoost `predict_proba` (pandas frame in,
+as POST /ml/predict does) against the padded-array NumPy evaluator in app/ml/tree_ensemble.py,
+across batch sizes, plus `risk_scorer.predict_proba`, which picks one of the two by row count
+(TREE_ENSEMBLE_MAX_ROWS).
+
+Usage: python scripts/benchmark_tree_ensemble.py
+"""
+import sys
+import os
+import time
+import joblib
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ml.tree_ensemble import TreeEnsemble
+from app.services.risk_scorer import (CLASSES_PATH, FEATURE_COLUMNS, MODEL_PATH, TREE_ENSEMBLE_MAX_ROWS,
+                                      build_features, risk_scorer)
+from scripts.check_tree_ensemble import random_vitals
+
+BATCH_SIZES = (1, 8, 32, 64, 256, 1024, 10000)
+# Enough repeats for a stable median without the 10k-row batch dominating the run
+ROW_BUDGET = 20000
+MAX_REPEATS = 300
+
+
+def timed(fn, repeats):
+    """Median seconds per call."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    pipeline = joblib.load(MODEL_PATH)
+    start = time.perf_counter()
+    ensemble = TreeEnsemble.from_pipeline(pipeline, joblib.load(CLASSES_PATH))
+    print(f"🌲 Exported {ensemble.n_trees} trees (depth {ensemble.depth}) in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    batch = build_features(random_vitals(max(BATCH_SIZES), seed=1))
+    print(f"{'rows':>6} {'pipeline':>12} {'numpy':>12} {'served':>12}   (numpy up to {TREE_ENSEMBLE_MAX_ROWS} rows)")
+    for rows in BATCH_SIZES:
+        frame = batch.iloc[:rows]
+        array = frame[FEATURE_COLUMNS].to_numpy()
+        repeats = max(5, min(MAX_REPEATS, ROW_BUDGET // rows))
+        reference = timed(lambda: pipeline.predict_proba(frame), repeats)
+        flat = timed(lambda: ensemble.predict_proba(array), repeats)
+        served = timed(lambda: risk_scorer.predict_proba(frame), repeats)
+        print(f"{rows:>6} {reference * 1000:>9.2f} ms {flat * 1000:>9.2f} ms {served * 1000:>9.2f} ms")
+
+if __name__ == "__main__":
+    main()
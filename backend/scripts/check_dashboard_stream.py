@@ -0,0 +1,110 @@
+"""
+Checks that one broadcaster publish after a write brings every dashboard section up to date:
+the streamed state must equal a cold recomputation, with no section served stale. Also checks
+that deltas list fields that disappeared from a section, so clients merging them drop those.
+
+Writes a few patients, publishes once, compares, then removes them again.
+
+Usage: python scripts/check_dashboard_stream.py [patients]
+"""
+import sys
+import os
+import random
+from datetime import datetime
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.session import SessionLocal
+from app.models.patient import Patient
+from app.core.cache import dashboard_cache
+from app.api.v1.endpoints.dashboard import DASHBOARD_SECTIONS, build_dashboard_metrics, dashboard_broadcaster
+from app.api.v1.endpoints.patients import new_patient_id
+from app.services.dashboard_broadcaster import diff_sections
+from app.services.census_rollup import census_rollup
+from app.services.patient_events import notify_patients_changed
+
+DEFAULT_PATIENTS = 3
+
+
+def apply_delta(state: dict, changes: dict, removed: dict) -> dict:
+    """What a client does with a delta frame: merge dict sections field by field, drop removed fields."""
+    merged = dict(state)
+    for key, value in changes.items():
+        merged[key] = {**merged[key], **value} if isinstance(value, dict) and isinstance(merged.get(key), dict) else value
+    for key, fields in removed.items():
+        merged[key] = {k: v for k, v in merged[key].items() if k not in fields}
+    return merged
+
+
+def check_removed_fields() -> bool:
+    previous = {"kpi": {"totalPatients": 10, "highRisk": 2}, "partial": True,
+                "errors": {"censusData": "timeout", "zoneBreakdown": "boom"}}
+    current = {"kpi": {"totalPatients": 11, "highRisk": 2}, "partial": True, "errors": {"zoneBreakdown": "boom"}}
+    cleared = {**current, "partial": False, "errors": {}}
+    ok = True
+    for label, before, after in [("one error cleared", previous, current), ("all errors cleared", current, cleared),
+                                 ("errors cleared in one step", previous, cleared)]:
+        changes, removed = diff_sections(before, after)
+        same = apply_delta(before, changes, removed) == after
+        ok &= same
+        print(f"{'✅' if same else '❌'} Delta with {label}: removed {removed}")
+    return ok
+
+
+def write_patients(db, count: int) -> list:
+    rng = random.Random(17)
+    now = datetime.now()
+    patients = [
+        Patient(id=new_patient_id(), name=f"Stream Check {i}", age=rng.randint(30, 90), gender="Male",
+                condition="Hypertension", admission_date=now, sys_bp=170, dia_bp=100, heart_rate=110,
+                spo2=90, temp=38.5, bmi=31.0, risk_score=90, risk_level="High", zone="North")
+        for i in range(count)
+    ]
+    db.add_all(patients)
+    census_rollup.record_added(db, [p.admission_date for p in patients], [p.zone for p in patients])
+    db.commit()
+    notify_patients_changed(count)
+    return [p.id for p in patients]
+
+
+def remove_patients(db, ids: list):
+    replaced = census_rollup.replaced_counts(db, ids)
+    db.query(Patient).filter(Patient.id.in_(ids)).delete(synchronize_session=False)
+    census_rollup.record_added(db, [], [], replaced=replaced)
+    db.commit()
+    notify_patients_changed(len(ids))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PATIENTS
+    ok = check_removed_fields()
+    dashboard_broadcaster.publish()  # seeds the streamed state and warms every section
+
+    db = SessionLocal()
+    ids = []
+    try:
+        ids = write_patients(db, count)
+        stale_before = dashboard_cache.stats()["stale_hits"]
+        changes, _ = dashboard_broadcaster.publish()
+        stale_hits = dashboard_cache.stats()["stale_hits"] - stale_before
+        streamed = dashboard_broadcaster._state
+
+        dashboard_cache.invalidate()
+        expected, _ = build_dashboard_metrics()
+    finally:
+        if ids:
+            remove_patients(db, ids)
+        db.close()
+
+    for name in DASHBOARD_SECTIONS:
+        same = streamed.get(name) == expected.get(name)
+        ok &= same
+        print(f"{'✅' if same else '❌'} {name}: {'matches' if same else 'differs from'} a cold recomputation")
+    print(f"{'✅' if stale_hits == 0 else '❌'} Stale reads during the publish: {stale_hits}")
+    print(f"{'✅' if changes else '❌'} Delta after writing {count} patients: {sorted(changes)}")
+    sys.exit(0 if ok and stale_hits == 0 and changes else 1)
+
+
+if __name__ == "__main__":
+    main()
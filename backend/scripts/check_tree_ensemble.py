@@ -0,0 +1,94 @@
+"""
+Parity check for app/ml/tree_ensemble.py: the padded-array NumPy evaluator must reproduce the
+risk pipeline's `predict_proba` bit for bit (margins and probabilities), including rows with
+missing vitals, and as served by `risk_scorer` for small batches. Exits non-zero on any mismatch, so it can gate a retrained model.
+
+Usage: python scripts/check_tree_ensemble.py [rows]
+"""
+import sys
+import os
+import joblib
+import numpy as np
+import pandas as pd
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ml.tree_ensemble import TreeEnsemble
+from app.services.risk_scorer import (CLASSES_PATH, FEATURE_COLUMNS, MODEL_PATH, TREE_ENSEMBLE_MAX_ROWS,
+                                      build_features, risk_scorer)
+
+DEFAULT_ROWS = 50000
+SMALL_BATCH_ROWS = 300
+
+
+def random_vitals(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Covers the clinical range and beyond, so every split threshold gets exercised."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'age': rng.integers(0, 110, rows),
+        'gender': rng.choice(['M', 'F', 'male', 'female'], rows),
+        'sys_bp': rng.integers(50, 240, rows),
+        'dia_bp': rng.integers(20, 140, rows),
+        'heart_rate': rng.integers(25, 200, rows),
+        'spo2': rng.uniform(70, 100, rows).round(1),
+        'temp': rng.uniform(33, 42, rows).round(1),
+        'bmi': rng.uniform(12, 60, rows).round(1),
+    })
+
+
+def compare(label, expected, actual) -> bool:
+    identical = np.array_equal(expected, actual)
+    rows_equal = (expected == actual).all(axis=1).mean() * 100
+    print(f"{'✅' if identical else '❌'} {label}: {rows_equal:.3f}% rows identical, "
+          f"max |diff| {np.abs(expected - actual).max():.3g}")
+    return identical
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    pipeline = joblib.load(MODEL_PATH)
+    ensemble = TreeEnsemble.from_pipeline(pipeline, joblib.load(CLASSES_PATH))
+    print(f"🌲 {ensemble.n_trees} trees, {ensemble.n_leaves} leaves each (padded), depth {ensemble.depth}, "
+          f"{ensemble.n_classes} classes")
+
+    features = build_features(random_vitals(rows))
+    missing = features.copy()
+    missing.loc[::7, 'spo2'] = np.nan
+    missing.loc[::11, ['age', 'shock_index']] = np.nan
+
+    ok = True
+    for label, frame in [("random vitals", features), ("with missing values", missing)]:
+        expected = pipeline.predict_proba(frame)
+        actual = ensemble.predict_proba(frame[FEATURE_COLUMNS].to_numpy())
+        ok &= compare(f"predict_proba, {label}", expected, actual)
+        ok &= bool(np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)))
+        # Small batches take the all-trees-per-level path
+        small = frame.iloc[:SMALL_BATCH_ROWS]
+        ok &= compare(f"predict_proba, {label}, {len(small)} rows",
+                      pipeline.predict_proba(small), ensemble.predict_proba(small[FEATURE_COLUMNS].to_numpy()))
+
+    # As served: risk_scorer hands batches of up to TREE_ENSEMBLE_MAX_ROWS rows to its ensemble
+    ok &= risk_scorer.ensemble is not None
+    small = missing.iloc[:SMALL_BATCH_ROWS]
+    served = np.concatenate([risk_scorer.predict_proba(small.iloc[i:i + TREE_ENSEMBLE_MAX_ROWS])
+                             for i in range(0, len(small), TREE_ENSEMBLE_MAX_ROWS)])
+    ok &= compare(f"risk_scorer.predict_proba, batches of {TREE_ENSEMBLE_MAX_ROWS}",
+                  pipeline.predict_proba(small), served)
+
+    # Round trip through the exported arrays
+    path = os.path.join(os.path.dirname(MODEL_PATH), "risk_model_arrays.check.npz")
+    ensemble.save(path)
+    try:
+        reloaded = TreeEnsemble.load(path)
+        ok &= compare("save/load round trip", ensemble.predict_proba(features[FEATURE_COLUMNS].to_numpy()),
+                      reloaded.predict_proba(features[FEATURE_COLUMNS].to_numpy()))
+    finally:
+        os.remove(path)
+
+    print("✅ Parity OK" if ok else "❌ Parity FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
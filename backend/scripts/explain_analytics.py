@@ -0,0 +1,61 @@
+"""
+Prints the query plan of every read the dashboard services issue on the configured database
+(KPI snapshot, census rollup) and checks that each is served by the expected index or by the
+`daily_census` rollup, never by a full scan of `patients`.
+
+Usage: python scripts/explain_analytics.py     (exit code 1 if any query misses its index)
+"""
+import sys
+import os
+from datetime import date, datetime, timedelta
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.session import engine, SessionLocal
+from app.db.indexes import ensure_indexes
+from app.services import analytics_queries as queries
+from app.services.census_rollup import daily_totals_query, latest_day_query
+from app.services.kpi_engine import CENSUS_WINDOW_DAYS, kpi_snapshot_query
+
+def analytics_queries(anchor):
+    """(label, statement, index/table names that may serve it), as kpi_engine and census_rollup run them"""
+    anchor_day = anchor.date()
+    return [
+        ("latest admission", queries.latest_admission(), ["ix_patients_admission_date_id"]),
+        ("KPI snapshot", kpi_snapshot_query(*queries.trailing_window(anchor, CENSUS_WINDOW_DAYS)),
+         ["ix_patients_zone_risk_level_admission"]),
+        # The rollup holds one row per day and zone, so scanning it is fine; it must not touch `patients`
+        ("census latest day", latest_day_query(), ["daily_census"]),
+        ("30-day census trend", daily_totals_query(anchor_day - timedelta(days=29), anchor_day + timedelta(days=1)),
+         ["daily_census"]),
+        ("census history", daily_totals_query(end=date.today()), ["daily_census"]),
+    ]
+
+def explain(db, statement):
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    rows = db.connection().exec_driver_sql(prefix + sql).fetchall()
+    # SQLite: (id, parent, notused, detail); PostgreSQL: one text column per plan line
+    return [row[-1] for row in rows]
+
+def main():
+    ensure_indexes(engine)
+    db = SessionLocal()
+    failures = 0
+    try:
+        anchor = db.execute(queries.latest_admission()).scalar() or datetime.now()
+        print(f"Database: {engine.dialect.name}, anchor admission: {anchor}\n")
+        for label, statement, expected in analytics_queries(anchor):
+            plan = explain(db, statement)
+            used = any(name in line for line in plan for name in expected)
+            failures += not used
+            print(f"{'✅' if used else '❌'} {label} (expects {' or '.join(expected)})")
+            for line in plan:
+                print(f"      {line}")
+    finally:
+        db.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ sys.path.append(os.getcwd())
 
 from app.db.session import engine
 from app.db.base_class import Base
+from app.db.indexes import ensure_indexes
 
 # --- CRITICAL: Force Import of Models ---
 # We print to verify they are loaded
@@ -14,6 +15,7 @@ print("🔄 Importing models...")
 try:
     from app.models.patient import Patient
     from app.models.user import User
+    from app.models.daily_census import DailyCensus
     print("✅ Models imported successfully.")
 except ImportError as e:
     print(f"❌ MODEL IMPORT FAILED: {e}")
@@ -34,6 +36,7 @@ def init_db():
     # 2. Force Create
     print("🛠  Creating tables now...")
     Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
     print("✅ Tables created in Neon database!")
     print("------------------------------------------------")
 
@@ -1,70 +1,201 @@
 import pandas as pd
 import numpy as np
-import uuid
 import os
-from datetime import datetime, timedelta
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
 
 # Settings
 NUM_RECORDS = 1_000_000
+CHUNK_ROWS = 250_000          # rows generated per task; bounds peak memory per worker
+DEFAULT_SEED = 42
 OUTPUT_DIR = "data"
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, "million_patients.csv")
+HISTORY_DAYS = 365
 
-def generate_data():
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        
-    print(f"Generating {NUM_RECORDS} records... This may take a minute.")
+ZONES = ['Home Care A', 'Home Care B', 'North Wing', 'Cardiac Unit', 'ICU Remote']
+CONDITIONS = ['COPD', 'CHF', 'Pneumonia', 'Sepsis', 'Hypertension']
+SPO2_VALUES = np.arange(85, 101)
+SPO2_PROBS = [0.01, 0.01, 0.02, 0.03, 0.03, 0.05, 0.05, 0.1, 0.2, 0.3, 0.15, 0.03, 0.01, 0.005, 0.005, 0.0]
+COLUMNS = ['id', 'name', 'age', 'gender', 'admission_date', 'condition', 'sys_bp', 'dia_bp',
+           'heart_rate', 'spo2', 'temp', 'bmi', 'risk_score', 'risk_level', 'zone']
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def random_hex(rng, n, width=6):
+    """Vectorized `uuid.uuid4().hex[:width]`: `width` random hex characters per row."""
+    nibbles = rng.integers(0, 16, size=(n, width), dtype=np.uint8)
+    return HEX_DIGITS[nibbles].view(f"S{width}").ravel().astype(str)
+
+
+def generate_chunk(chunk_index, start_row, num_rows, seed, anchor_date):
+    """
+    Builds one chunk of patients. Every chunk draws from its own SeedSequence child,
+    so the output depends only on (seed, chunk layout, anchor_date) - not on how many
+    workers ran or in which order they finished.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    n = num_rows
 
     # 1. Demographics
-    ids = [f"PAT-{1000000 + i}" for i in range(NUM_RECORDS)]
-    ages = np.random.randint(18, 90, size=NUM_RECORDS)
-    genders = np.random.choice(['M', 'F'], size=NUM_RECORDS)
-    zones = np.random.choice(['Home Care A', 'Home Care B', 'North Wing', 'Cardiac Unit', 'ICU Remote'], size=NUM_RECORDS)
-    
+    ids = "PAT-" + pd.Series(np.arange(1000000 + start_row, 1000000 + start_row + n)).astype(str)
+    ages = rng.integers(18, 90, size=n)
+    genders = rng.choice(np.array(['M', 'F']), size=n)
+    zones = rng.choice(np.array(ZONES), size=n)
+
     # 2. Clinical Metrics (Correlated)
-    bmi = np.clip(np.random.normal(26.5, 5.0, NUM_RECORDS), 16.0, 45.0).round(1)
-    has_hypertension = (ages > 50) & (bmi > 30) | (np.random.rand(NUM_RECORDS) < 0.2)
-    has_diabetes = (bmi > 32) | (np.random.rand(NUM_RECORDS) < 0.1)
+    bmi = np.clip(rng.normal(26.5, 5.0, n), 16.0, 45.0).round(1)
+    has_hypertension = (ages > 50) & (bmi > 30) | (rng.random(n) < 0.2)
+    has_diabetes = (bmi > 32) | (rng.random(n) < 0.1)
 
     # 3. Vitals
-    sys_bp = (np.random.normal(120, 10, NUM_RECORDS) + (has_hypertension * 20)).astype(int)
-    dia_bp = (np.random.normal(80, 8, NUM_RECORDS) + (has_hypertension * 10)).astype(int)
-    heart_rate = np.random.normal(72, 12, NUM_RECORDS).astype(int)
-    spo2 = np.random.choice(np.arange(85, 101), size=NUM_RECORDS, p=[0.01, 0.01, 0.02, 0.03, 0.03, 0.05, 0.05, 0.1, 0.2, 0.3, 0.15, 0.03, 0.01, 0.005, 0.005, 0.0])
+    sys_bp = (rng.normal(120, 10, n) + (has_hypertension * 20)).astype(int)
+    dia_bp = (rng.normal(80, 8, n) + (has_hypertension * 10)).astype(int)
+    heart_rate = rng.normal(72, 12, n).astype(int)
+    spo2 = rng.choice(SPO2_VALUES, size=n, p=SPO2_PROBS)
 
     # 4. Risk Calculation
     risk_score_raw = (
-        ((ages - 40) * 0.5) + ((bmi - 25) * 1.5) + 
+        ((ages - 40) * 0.5) + ((bmi - 25) * 1.5) +
         (has_diabetes * 15) + (has_hypertension * 10) + ((100 - spo2) * 2)
     )
-    risk_score = np.clip(risk_score_raw + np.random.normal(0, 5, NUM_RECORDS), 0, 100).astype(int)
-    
+    risk_score = np.clip(risk_score_raw + rng.normal(0, 5, n), 0, 100).astype(int)
+
     conditions_list = [(risk_score >= 80), (risk_score >= 60), (risk_score >= 30)]
     choices = ['Critical', 'High', 'Medium']
     risk_level = np.select(conditions_list, choices, default='Low')
 
-    # 5. Dates
-    start_date = datetime.now() - timedelta(days=365)
-    dates = [start_date + timedelta(days=int(d)) for d in np.random.randint(0, 365, NUM_RECORDS)]
-    dates_str = [d.strftime("%Y-%m-%d") for d in dates]
+    # 5. Dates (datetime64 arithmetic, no per-row Python objects)
+    start_date = np.datetime64(anchor_date, 'D') - np.timedelta64(HISTORY_DAYS, 'D')
+    dates = start_date + rng.integers(0, HISTORY_DAYS, n).astype('timedelta64[D]')
 
     # 6. DataFrame
-    df = pd.DataFrame({
+    return pd.DataFrame({
         'id': ids,
-        'name': [f"Patient_{uuid.uuid4().hex[:6]}" for _ in range(NUM_RECORDS)],
+        'name': np.char.add("Patient_", random_hex(rng, n)),
         'age': ages,
         'gender': genders,
-        'admission_date': dates_str,
-        'condition': np.random.choice(['COPD', 'CHF', 'Pneumonia', 'Sepsis', 'Hypertension'], size=NUM_RECORDS),
+        'admission_date': np.datetime_as_string(dates, unit='D'),
+        'condition': rng.choice(np.array(CONDITIONS), size=n),
         'sys_bp': sys_bp, 'dia_bp': dia_bp, 'heart_rate': heart_rate, 'spo2': spo2,
-        'temp': np.round(np.random.normal(36.8, 0.4, NUM_RECORDS), 1),
+        'temp': np.round(rng.normal(36.8, 0.4, n), 1),
         'bmi': bmi,
         'risk_score': risk_score, 'risk_level': risk_level, 'zone': zones
     })
 
-    print(f"Saving to {OUTPUT_FILE}...")
-    df.to_csv(OUTPUT_FILE, index=False)
+
+def render_chunk(fmt, *chunk_args):
+    # Runs in the worker: CSV text is rendered there so the parent only appends bytes
+    df = generate_chunk(*chunk_args)
+    if fmt == "csv":
+        return df.to_csv(index=False, header=False)
+    return df
+
+
+def shard_path(output_dir, shard, shards, fmt):
+    if shards == 1 and fmt == "csv":
+        return os.path.join(output_dir, os.path.basename(OUTPUT_FILE))
+    return os.path.join(output_dir, f"patients-{shard:05d}-of-{shards:05d}.{fmt}")
+
+
+class ShardWriter:
+    """Appends chunks to the current shard file; only one shard is open at a time."""
+    def __init__(self, output_dir, shards, fmt):
+        self.output_dir, self.shards, self.fmt = output_dir, shards, fmt
+        self.shard = None
+        self.handle = None
+        self.paths = []
+
+    def write(self, shard, payload):
+        if self.fmt == "csv":
+            self._open(shard, lambda path: open(path, "w", newline=""))
+            self.handle.write(payload)
+        else:
+            # Optional dependency: only needed for --format parquet
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(payload, preserve_index=False)
+            self._open(shard, lambda path: pq.ParquetWriter(path, table.schema))
+            self.handle.write_table(table)
+
+    def _open(self, shard, opener):
+        if shard == self.shard:
+            return
+        self.close()
+        self.shard = shard
+        path = shard_path(self.output_dir, shard, self.shards, self.fmt)
+        self.paths.append(path)
+        self.handle = opener(path)
+        if self.fmt == "csv":
+            self.handle.write(",".join(COLUMNS) + "\n")
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def generate_data(num_records=NUM_RECORDS, seed=DEFAULT_SEED, workers=None, shards=1, fmt="csv",
+                  chunk_rows=CHUNK_ROWS, output_dir=OUTPUT_DIR, anchor_date=None):
+    """
+    Streams `num_records` synthetic patients to disk in fixed-size chunks generated across a
+    process pool. At most `2 * workers` chunks are in flight, so peak memory stays flat no
+    matter how many rows are requested. Shards hold contiguous id ranges.
+    """
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow).")
+
+    anchor_date = anchor_date or date.today().isoformat()
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    num_chunks = -(-num_records // chunk_rows)
+    shards = max(1, min(shards, num_chunks))
+    print(f"Generating {num_records:,} records in {num_chunks} chunks on {workers} workers "
+          f"(seed={seed}, anchor_date={anchor_date}, shards={shards}, format={fmt})...")
+
+    def chunk_args(index):
+        start_row = index * chunk_rows
+        return (fmt, index, start_row, min(chunk_rows, num_records - start_row), seed, anchor_date)
+
+    writer = ShardWriter(output_dir, shards, fmt)
+    pending = deque()
+    next_chunk = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for written in range(num_chunks):
+                # Keep the window full, then consume results strictly in chunk order
+                while next_chunk < num_chunks and len(pending) < 2 * workers:
+                    pending.append(pool.submit(render_chunk, *chunk_args(next_chunk)))
+                    next_chunk += 1
+                payload = pending.popleft().result()
+                writer.write(written * shards // num_chunks, payload)
+                print(f"   Chunk {written + 1}/{num_chunks} written ({min((written + 1) * chunk_rows, num_records):,} rows)")
+    finally:
+        writer.close()
+
+    for path in writer.paths:
+        print(f"Saved {path}")
     print("Done!")
+    return writer.paths
+
 
 if __name__ == "__main__":
-    generate_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Deterministic synthetic patient dataset generator")
+    parser.add_argument("--rows", type=int, default=NUM_RECORDS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--shards", type=int, default=1, help="Number of output files")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--anchor-date", default=None,
+                        help="Last day of the admission window (YYYY-MM-DD); pin it to reproduce a dataset exactly")
+    args = parser.parse_args()
+
+    generate_data(args.rows, args.seed, args.workers, args.shards, args.format,
+                  args.chunk_rows, args.output_dir, args.anchor_date)
@@ -2,17 +2,36 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import time
+import queue
+import json
+import hashlib
+import argparse
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # --- Setup Paths ---
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.db.session import SessionLocal
-from app.models.patient import Patient
+from app.services.data_ingestion import patient_upsert_statement
+from app.services.census_rollup import census_rollup
+from app.services.patient_events import notify_patients_changed
 
 # CONFIGURATION
 FILE_PATH = "data/million_patients.csv"
 CHUNK_SIZE = 10000 
+TRANSFORM_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+WRITER_WORKERS = 4
+QUEUE_DEPTH = 8
+
+# Sentinel passed down the queues when a stage has no more work
+_DONE = None
+# How often a stage blocked on a queue re-checks whether the pipeline is being torn down
+STOP_POLL_SECONDS = 0.1
 
 # *** MAPPING ***
 RENAME_MAP = {
@@ -27,124 +46,458 @@ RENAME_MAP = {
     "name": "name"
 }
 
-def calculate_clinical_risk(row):
-    score = 0
-    if row.get('systolic_bp', 0) > 140 or row.get('diastolic_bp', 0) > 90: score += 30
-    if row.get('heart_rate', 0) > 100 or row.get('heart_rate', 0) < 60: score += 20
-    if row.get('spo2', 0) < 95: score += 25
-    if row.get('bmi', 0) > 30: score += 15
-    return min(score, 100)
+def calculate_clinical_risk(chunk):
+    """
+    Vectorized ingest-time heuristic: one score per row of the (renamed) chunk.
+    """
+    def col(name):
+        return chunk[name].to_numpy(dtype=float) if name in chunk.columns else np.zeros(len(chunk))
 
-def categorize_risk(score):
-    if score > 70: return 'High'
-    if score > 30: return 'Moderate'
-    return 'Low'
+    sys_bp, dia_bp, heart_rate = col('systolic_bp'), col('diastolic_bp'), col('heart_rate')
+    score = (
+        ((sys_bp > 140) | (dia_bp > 90)) * 30
+        + ((heart_rate > 100) | (heart_rate < 60)) * 20
+        + (col('spo2') < 95) * 25
+        + (col('bmi') > 30) * 15
+    )
+    return np.minimum(score, 100)
 
-def process_chunk(chunk, db):
+def categorize_risk(scores):
+    scores = np.asarray(scores, dtype=float)
+    return np.select([scores > 70, scores > 30], ['High', 'Moderate'], default='Low')
+
+def transform_chunk(chunk):
+    """
+    Columnar clean + feature engineering. Returns a frame whose columns match the `patients` table.
+    """
     # 0. NORMALIZE COLUMNS
-    chunk.rename(columns=RENAME_MAP, inplace=True)
+    chunk = chunk.rename(columns=RENAME_MAP)
 
     # 1. CLEANING
     required_cols = ['age', 'systolic_bp', 'diastolic_bp']
-    chunk.dropna(subset=required_cols, inplace=True)
-    
+    chunk = chunk.dropna(subset=required_cols)
+
     # Fill missing values with safe defaults
-    chunk['spo2'] = chunk.get('spo2', pd.Series([98.0]*len(chunk))).fillna(98.0)
-    chunk['temperature'] = chunk.get('temperature', pd.Series([37.0]*len(chunk))).fillna(37.0)
-    chunk['heart_rate'] = chunk.get('heart_rate', pd.Series([72.0]*len(chunk))).fillna(72.0)
-    
+    for column, default in (('spo2', 98.0), ('temperature', 37.0), ('heart_rate', 72.0)):
+        chunk[column] = chunk[column].fillna(default) if column in chunk.columns else default
+
     # 2. FEATURE ENGINEERING
     # Use existing BMI if valid, else calculate
     if 'bmi' not in chunk.columns:
         if 'weight_kg' in chunk.columns and 'height_cm' in chunk.columns:
-            chunk = chunk[chunk['height_cm'] > 0]
-            chunk['bmi'] = chunk['weight_kg'] / ((chunk['height_cm'] / 100) ** 2)
-            chunk['bmi'] = chunk['bmi'].round(2)
+            chunk = chunk[chunk['height_cm'] > 0].copy()
+            chunk['bmi'] = (chunk['weight_kg'] / ((chunk['height_cm'] / 100) ** 2)).round(2)
         else:
             chunk['bmi'] = 0.0
-    
+
     # Ensure Risk Score Exists
     if 'risk_score' not in chunk.columns:
-        chunk['risk_score'] = chunk.apply(calculate_clinical_risk, axis=1)
-    
+        chunk['risk_score'] = calculate_clinical_risk(chunk)
+
     if 'risk_level' not in chunk.columns:
-        chunk['risk_level'] = chunk['risk_score'].apply(categorize_risk)
+        chunk['risk_level'] = categorize_risk(chunk['risk_score'])
 
-    # 3. PREPARE BUFFER
-    patients_buffer = []
-    
-    for _, row in chunk.iterrows():
-        # Parse Dates
-        adm_date = row.get('admission_date')
-        if pd.isna(adm_date):
-            adm_date = datetime.now()
-        else:
-            try:
-                adm_date = pd.to_datetime(adm_date)
-            except:
-                adm_date = datetime.now()
-
-        # Create Patient Object
-        patient = Patient(
-            # *** FIX: EXPLICITLY PASS ID ***
-            id=str(row.get('id', f"PAT-{np.random.randint(1000000,9999999)}")), 
-            name=row.get('name', "Unknown"),
-            age=int(row['age']),
-            gender=row.get('gender', 'Unknown'),
-            condition=row.get('condition', 'General Checkup'),
-            admission_date=adm_date,
-            
-            # Vitals
-            sys_bp=int(row['systolic_bp']),
-            dia_bp=int(row['diastolic_bp']),
-            heart_rate=int(row['heart_rate']),
-            spo2=float(row['spo2']),
-            temp=float(row['temperature']),
-            bmi=float(row.get('bmi', 0)),
-            
-            # Computed Features
-            risk_score=float(row.get('risk_score', 0)),
-            risk_level=row.get('risk_level', 'Low'),
-            zone=row.get('zone', 'General Ward')
-        )
-        patients_buffer.append(patient)
-
-    # 4. BULK INSERT
+    # 3. PARSE DATES (unparseable or missing -> now)
+    if 'admission_date' in chunk.columns:
+        raw_dates = chunk['admission_date']
+        # Fast path infers one format for the whole column; stragglers are parsed individually
+        admission_dates = pd.to_datetime(raw_dates, errors='coerce')
+        stragglers = admission_dates.isna() & raw_dates.notna()
+        if stragglers.any():
+            admission_dates[stragglers] = pd.to_datetime(raw_dates[stragglers], errors='coerce', format='mixed')
+    else:
+        admission_dates = pd.Series(pd.NaT, index=chunk.index, dtype='datetime64[ns]')
+    admission_dates = admission_dates.fillna(pd.Timestamp(datetime.now()))
+
+    def text_column(name, default):
+        return chunk[name] if name in chunk.columns else default
+
+    if 'id' in chunk.columns:
+        ids = chunk['id'].astype(str)
+    else:
+        ids = "PAT-" + pd.Series(np.random.randint(1000000, 9999999, len(chunk)), index=chunk.index).astype(str)
+
+    # 4. BUILD COLUMNAR RECORDS
+    return pd.DataFrame({
+        'id': ids,
+        'name': text_column('name', "Unknown"),
+        'age': chunk['age'].astype(int),
+        'gender': text_column('gender', 'Unknown'),
+        'condition': text_column('condition', 'General Checkup'),
+        'admission_date': admission_dates,
+
+        # Vitals
+        'sys_bp': chunk['systolic_bp'].astype(int),
+        'dia_bp': chunk['diastolic_bp'].astype(int),
+        'heart_rate': chunk['heart_rate'].astype(int),
+        'spo2': chunk['spo2'].astype(float),
+        'temp': chunk['temperature'].astype(float),
+        'bmi': chunk['bmi'].astype(float),
+
+        # Computed Features
+        'risk_score': chunk['risk_score'].astype(float),
+        'risk_level': chunk['risk_level'],
+        'zone': text_column('zone', 'General Ward'),
+    }, index=chunk.index)
+
+def write_records(records, db):
+    """
+    Core upsert of plain dict batches (no ORM identity map / unit of work).
+    Existing ids are updated in place, so re-running a chunk is safe.
+    """
+    if records.empty:
+        return 0
+    # Day/zone of the rows this upsert is about to overwrite, read before it
+    replaced = census_rollup.replaced_counts(db, records['id'])
+    db.execute(patient_upsert_statement(db.get_bind().dialect.name), records.to_dict('records'))
+    # Rollup delta last (keys sorted): parallel writers contend on the same hot (day, zone) rows,
+    # which then stay locked only for the commit instead of the whole chunk upsert
+    census_rollup.record_added(db, records['admission_date'], records['zone'], replaced=replaced)
+    db.commit()
+    # In-process caches only; a separate API process picks the rows up when its cache TTL expires
+    notify_patients_changed(len(records))
+    return len(records)
+
+def process_chunk(chunk, db):
+    records = transform_chunk(chunk)
+
+    # BULK INSERT
     try:
-        db.add_all(patients_buffer)
-        db.commit()
-        print(f"   ✅ Committed chunk of {len(patients_buffer)} records.")
+        written = write_records(records, db)
+        print(f"   ✅ Committed chunk of {written} records.")
     except Exception as e:
         print(f"   ❌ Error committing chunk: {e}")
         db.rollback()
 
-def run_pipeline():
-    print(f"🚀 Starting Ingestion Pipeline for: {FILE_PATH}")
+class StageStats:
+    """
+    Thread-safe counters for one pipeline stage.
+    busy  = time spent doing the stage's own work
+    stall = time spent blocked on the neighbouring queues (starved upstream or back-pressured downstream)
+    """
+    def __init__(self, name):
+        self.name = name
+        self.chunks = 0
+        self.rows = 0
+        self.busy = 0.0
+        self.stall = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, rows=0, busy=0.0, stall=0.0, chunks=0, errors=0):
+        with self._lock:
+            self.rows += rows
+            self.busy += busy
+            self.stall += stall
+            self.chunks += chunks
+            self.errors += errors
+
+    def row(self, workers):
+        # Capacity of the stage: rows per second of busy time across all of its workers
+        rate = self.rows / (self.busy / workers) if self.busy > 0 else 0.0
+        return f"{self.name:<10}{workers:>8}{self.chunks:>8}{self.rows:>11,}{self.busy:>10.2f}{self.stall:>10.2f}{rate:>13,.0f}{self.errors:>8}"
+
+class IngestionCheckpoint:
+    """
+    JSON manifest stored next to the CSV (`<file>.checkpoint.json`).
+
+    Records the file's SHA-256, the chunk size and the highest chunk index below which every
+    chunk has been committed (`committed_through`, plus `row_offset` = raw CSV rows covered).
+    Writers commit out of order, so chunks already committed beyond that watermark are kept
+    in `committed_ahead` and skipped on resume as well.
+    """
+    def __init__(self, file_path, chunk_size):
+        self.path = f"{file_path}.checkpoint.json"
+        self.file_hash = file_sha256(file_path)
+        self.chunk_size = chunk_size
+        self.committed_through = -1
+        self.committed_ahead = set()
+        self.rows_committed = 0
+        self.complete = False
+        self._lock = threading.Lock()
+
+    @property
+    def row_offset(self):
+        return (self.committed_through + 1) * self.chunk_size
+
+    def load(self):
+        """Adopts a previous run's progress if it was for the same file content and chunking."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            manifest = json.load(f)
+        if manifest.get("file_hash") != self.file_hash or manifest.get("chunk_size") != self.chunk_size:
+            print("ℹ️  Checkpoint is for a different file version or chunk size; starting over.")
+            return False
+        self.committed_through = manifest["committed_through"]
+        self.committed_ahead = set(manifest.get("committed_ahead", []))
+        self.rows_committed = manifest.get("rows_committed", 0)
+        self.complete = manifest.get("complete", False)
+        return True
+
+    def is_committed(self, index):
+        return index <= self.committed_through or index in self.committed_ahead
+
+    def mark_committed(self, index, rows):
+        with self._lock:
+            self.committed_ahead.add(index)
+            while self.committed_through + 1 in self.committed_ahead:
+                self.committed_through += 1
+                self.committed_ahead.remove(self.committed_through)
+            self.rows_committed += rows
+            self._save()
+
+    def mark_complete(self):
+        with self._lock:
+            self.complete = True
+            self._save()
+
+    def _save(self):
+        manifest = {
+            "file_hash": self.file_hash,
+            "chunk_size": self.chunk_size,
+            "committed_through": self.committed_through,
+            "row_offset": self.row_offset,
+            "committed_ahead": sorted(self.committed_ahead),
+            "rows_committed": self.rows_committed,
+            "complete": self.complete,
+            "updated_at": datetime.now().isoformat(),
+        }
+        # Write-then-rename so a crash never leaves a truncated manifest behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def file_sha256(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _timed_put(q, item, stats, stop):
+    """Blocking put; gives up (returns False) once `stop` is set, so a dead consumer cannot wedge its producer."""
+    start = time.perf_counter()
+    try:
+        while True:
+            try:
+                q.put(item, timeout=STOP_POLL_SECONDS)
+                return True
+            except queue.Full:
+                if stop.is_set():
+                    return False
+    finally:
+        stats.record(stall=time.perf_counter() - start)
+
+def _timed_get(q, stats, stop):
+    """Blocking get; returns _DONE once `stop` is set and the queue is drained."""
+    start = time.perf_counter()
+    try:
+        while True:
+            try:
+                return q.get(timeout=STOP_POLL_SECONDS)
+            except queue.Empty:
+                if stop.is_set():
+                    return _DONE
+    finally:
+        stats.record(stall=time.perf_counter() - start)
+
+def _stage_failed(name, error, stats, stop, failures):
+    # A stage that dies outside its per-chunk handling tears the whole pipeline down
+    stats.record(errors=1)
+    failures.append(error)
+    stop.set()
+    print(f"❌ {name} stage failed, stopping the pipeline: {error}")
+
+def _timed_transform(index, chunk):
+    # Runs inside the process pool; returns the work time so the parent can account for it
+    start = time.perf_counter()
+    records = transform_chunk(chunk)
+    return index, records, time.perf_counter() - start
+
+def _reader_stage(file_path, chunk_size, checkpoint, raw_queue, stats, reached_eof, stop):
+    # Resume: skip the committed prefix without parsing it (row 0 is the header)
+    first_index = checkpoint.committed_through + 1
+    skiprows = range(1, checkpoint.row_offset + 1) if first_index > 0 else None
+    try:
+        with pd.read_csv(file_path, chunksize=chunk_size, skiprows=skiprows) as reader:
+            for index in itertools.count(first_index):
+                start = time.perf_counter()
+                chunk = next(reader, None)
+                if chunk is None:
+                    reached_eof.set()
+                    break
+                if checkpoint.is_committed(index):
+                    continue
+                stats.record(rows=len(chunk), busy=time.perf_counter() - start, chunks=1)
+                if stats.chunks == 1:
+                    print(f"ℹ️  Processing CSV Columns: {chunk.columns.tolist()}")
+                if not _timed_put(raw_queue, (index, chunk), stats, stop):
+                    break
+    except Exception as e:
+        stats.record(errors=1)
+        print(f"❌ Reader Error: {e}")
+    finally:
+        _timed_put(raw_queue, _DONE, stats, stop)
+
+def _transform_stage(raw_queue, write_queue, pool, workers, writer_count, stats, stop, failures):
+    """
+    Keeps at most `workers` chunks in flight on the process pool and hands results
+    to the writers in submission order. A failure of the stage itself (e.g. a broken
+    pool on `submit`) sets `stop`, which unblocks the reader and the writers.
+    """
+    pending = deque()
+
+    def hand_off(future):
+        try:
+            index, records, seconds = future.result()
+            stats.record(rows=len(records), busy=seconds, chunks=1)
+            _timed_put(write_queue, (index, records), stats, stop)
+        except Exception as e:
+            stats.record(errors=1)
+            print(f"   ❌ Error transforming chunk: {e}")
+
+    try:
+        while not stop.is_set():
+            item = _timed_get(raw_queue, stats, stop)
+            if item is _DONE:
+                break
+            pending.append(pool.submit(_timed_transform, *item))
+            if len(pending) >= workers:
+                hand_off(pending.popleft())
+        while pending and not stop.is_set():
+            hand_off(pending.popleft())
+    except Exception as e:
+        _stage_failed("Transform", e, stats, stop, failures)
+    finally:
+        for _ in range(writer_count):
+            _timed_put(write_queue, _DONE, stats, stop)
+
+def _writer_stage(write_queue, checkpoint, stats, stop, failures):
+    # Each writer owns a session, i.e. its own pooled connection from the SessionLocal engine
+    db = None
+    try:
+        db = SessionLocal()
+        while True:
+            item = _timed_get(write_queue, stats, stop)
+            if item is _DONE:
+                break
+            index, records = item
+            start = time.perf_counter()
+            try:
+                written = write_records(records, db)
+                stats.record(rows=written, busy=time.perf_counter() - start, chunks=1)
+                checkpoint.mark_committed(index, written)
+            except Exception as e:
+                db.rollback()
+                stats.record(busy=time.perf_counter() - start, errors=1)
+                print(f"   ❌ Error committing chunk: {e}")
+    except Exception as e:
+        _stage_failed("Writer", e, stats, stop, failures)
+    finally:
+        if db is not None:
+            db.close()
+
+def run_pipeline(file_path=FILE_PATH, chunk_size=CHUNK_SIZE, transform_workers=TRANSFORM_WORKERS,
+                 writer_workers=WRITER_WORKERS, queue_depth=QUEUE_DEPTH, restart=False):
+    """
+    Staged ingestion: CSV reader -> process pool of transforms -> N DB writers,
+    joined by bounded queues so a slow stage back-pressures the ones before it.
+
+    Progress is checkpointed per committed chunk; a rerun on the same file resumes
+    after the last committed chunk unless `restart` is set. Writes are upserts, so
+    re-processing a chunk that was partly written before a crash is harmless.
+    """
+    print(f"🚀 Starting Ingestion Pipeline for: {file_path}")
     
-    if not os.path.exists(FILE_PATH):
-        print(f"❌ File not found at: {FILE_PATH}")
+    if not os.path.exists(file_path):
+        print(f"❌ File not found at: {file_path}")
         return
 
-    db = SessionLocal()
-    total_processed = 0
+    checkpoint = IngestionCheckpoint(file_path, chunk_size)
+    if not restart and checkpoint.load():
+        if checkpoint.complete:
+            print(f"✅ {file_path} was already fully ingested ({checkpoint.rows_committed} rows). Use --restart to reload.")
+            return
+        print(f"⏩ Resuming after chunk {checkpoint.committed_through + 1} "
+              f"(row offset {checkpoint.row_offset}, {len(checkpoint.committed_ahead)} later chunks already committed).")
+    resumed_from_row = checkpoint.row_offset
+
+    if SessionLocal.kw["bind"].dialect.name == "sqlite" and writer_workers > 1:
+        # SQLite serialises writers on a file lock; extra connections would only contend
+        print("ℹ️  SQLite detected: using a single writer connection.")
+        writer_workers = 1
+
+    raw_queue = queue.Queue(maxsize=queue_depth)
+    write_queue = queue.Queue(maxsize=queue_depth)
+    reader_stats, transform_stats, writer_stats = StageStats("reader"), StageStats("transform"), StageStats("writer")
+    reached_eof = threading.Event()
+    # Set when a stage dies; every blocked put/get then returns so the threads can be joined
+    stop = threading.Event()
+    failures = []
+    pipeline_error = None
+    start_time = time.perf_counter()
 
     try:
-        # Read first chunk to validate headers
-        with pd.read_csv(FILE_PATH, chunksize=CHUNK_SIZE) as reader:
-            for i, chunk in enumerate(reader):
-                if i == 0:
-                    print(f"ℹ️  Processing CSV Columns: {chunk.columns.tolist()}")
-                
-                print(f"🔄 Processing Chunk {i+1}...")
-                process_chunk(chunk, db)
-                total_processed += len(chunk)
-                
-        print(f"🎉 SUCCESS! Total Processed: {total_processed} Patients.")
-        
+        with ProcessPoolExecutor(max_workers=transform_workers) as pool:
+            threads = [
+                threading.Thread(target=_reader_stage,
+                                 args=(file_path, chunk_size, checkpoint, raw_queue, reader_stats, reached_eof, stop),
+                                 name="reader"),
+                threading.Thread(target=_transform_stage,
+                                 args=(raw_queue, write_queue, pool, transform_workers, writer_workers, transform_stats,
+                                       stop, failures),
+                                 name="transform"),
+            ] + [
+                threading.Thread(target=_writer_stage, args=(write_queue, checkpoint, writer_stats, stop, failures),
+                                 name=f"writer-{i}")
+                for i in range(writer_workers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        if failures:
+            raise failures[0]
     except Exception as e:
+        pipeline_error = e
         print(f"❌ Critical Pipeline Error: {e}")
-    finally:
-        db.close()
+
+    elapsed = time.perf_counter() - start_time
+    failed = reader_stats.errors + transform_stats.errors + writer_stats.errors
+    # Complete only if the whole file was read and every chunk read was committed
+    complete = (pipeline_error is None and failed == 0 and reached_eof.is_set()
+                and writer_stats.chunks == reader_stats.chunks)
+    if complete:
+        checkpoint.mark_complete()
+    print(f"\n{'stage':<10}{'workers':>8}{'chunks':>8}{'rows':>11}{'busy(s)':>10}{'stall(s)':>10}{'rows/s busy':>13}{'errors':>8}")
+    print(reader_stats.row(1))
+    print(transform_stats.row(transform_workers))
+    print(writer_stats.row(writer_workers))
+    print(f"{'🎉 SUCCESS!' if complete else '⚠️  INCOMPLETE (rerun to resume)'} "
+          f"Total Processed: {writer_stats.rows} Patients in {elapsed:.2f}s "
+          f"({writer_stats.rows / elapsed if elapsed > 0 else 0:,.0f} rows/s end-to-end).")
+
+    return {
+        "total_rows": writer_stats.rows,
+        "complete": complete,
+        "error": str(pipeline_error) if pipeline_error is not None else None,
+        "resumed_from_row": resumed_from_row,
+        "duration_seconds": round(elapsed, 2),
+        "stages": {stats.name: {"chunks": stats.chunks, "rows": stats.rows, "busy_seconds": round(stats.busy, 3),
+                                "stall_seconds": round(stats.stall, 3), "errors": stats.errors}
+                   for stats in (reader_stats, transform_stats, writer_stats)}
+    }
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Staged CSV -> patients ingestion pipeline")
+    parser.add_argument("--file", default=FILE_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--transform-workers", type=int, default=TRANSFORM_WORKERS)
+    parser.add_argument("--writers", type=int, default=WRITER_WORKERS)
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH)
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and reload the whole file")
+    args = parser.parse_args()
+
+    run_pipeline(args.file, args.chunk_size, args.transform_workers, args.writers, args.queue_depth, args.restart)
@@ -2,11 +2,13 @@
 import logging
 from app.db.session import engine
 from app.db.base_class import Base
+from app.db.indexes import ensure_indexes
 
 # *** IMPORT ALL MODELS HERE ***
 # This is crucial! If you don't import them, SQLAlchemy won't see them.
 from app.models.patient import Patient
 from app.models.user import User 
+from app.models.daily_census import DailyCensus
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +18,7 @@ def init_db():
     try:
         # This line looks at all imported models and creates tables in Neon
         Base.metadata.create_all(bind=engine)
+        ensure_indexes(engine)
         logger.info("✅ Tables created successfully!")
     except Exception as e:
         logger.error(f"❌ Error creating tables: {e}")
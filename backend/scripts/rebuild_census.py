@@ -0,0 +1,34 @@
+import sys
+import os
+import time
+
+# --- Setup Paths ---
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.session import engine, SessionLocal
+from app.db.base_class import Base
+from app.models.daily_census import DailyCensus
+from app.services.census_rollup import census_rollup
+
+def rebuild_census():
+    """
+    Recomputes `daily_census` from the `patients` table in one transaction.
+    Writers keep the rollup current on their own; run this after loading data outside the
+    app (manual SQL, restores) or if the rollup is ever suspected to have drifted.
+    """
+    print("📊 Rebuilding daily census rollup...")
+    Base.metadata.create_all(bind=engine, tables=[DailyCensus.__table__])
+    start_time = time.time()
+    db = SessionLocal()
+    try:
+        buckets = census_rollup.rebuild(db)
+        db.commit()
+        print(f"✅ Rollup rebuilt: {buckets} (day, zone) buckets in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        print(f"❌ Error rebuilding rollup: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_census()
@@ -1,5 +1,6 @@
 import sys
 import os
+import glob
 from sqlalchemy import text
 
 # --- Setup Paths ---
@@ -7,15 +8,22 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.db.session import SessionLocal
 
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
 def reset_patients_table():
-    print("🗑️  Cleaning 'patients' table...")
+    print("🗑️  Cleaning 'patients' and 'daily_census' tables...")
     db = SessionLocal()
     try:
         # TRUNCATE is faster than DELETE and resets the table completely
         # We use CASCADE just in case there are future dependencies, though none exist now.
-        db.execute(text("TRUNCATE TABLE patients CASCADE;"))
+        db.execute(text("TRUNCATE TABLE patients, daily_census CASCADE;"))
         db.commit()
         print("✅ 'patients' table has been successfully cleared.")
+
+        # Ingestion checkpoints describe rows that no longer exist; drop them so reloads start from zero
+        for manifest in glob.glob(os.path.join(DATA_DIR, "*.checkpoint.json")):
+            os.remove(manifest)
+            print(f"🧹 Removed ingestion checkpoint: {os.path.basename(manifest)}")
     except Exception as e:
         print(f"❌ Error resetting table: {e}")
         db.rollback()